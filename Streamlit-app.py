@@ -1,10 +1,21 @@
 import streamlit as st
 import requests
 from typing import List
+import json
 import time
 
 # Configuration
 API_BASE_URL = "http://localhost:8000"  # Change this to your backend URL
+JOB_POLL_INTERVAL = 1  # seconds between ingestion job status checks
+
+STAGE_LABELS = {
+    'queued': '⏳ Queued',
+    'parsing': '📖 Parsing',
+    'storing': '🧠 Embedding & storing',
+    'done': '✅ Done',
+    'skipped': '♻️ Already stored',
+    'failed': '❌ Failed',
+}
 
 # Page configuration
 st.set_page_config(
@@ -160,14 +171,78 @@ if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'files_uploaded' not in st.session_state:
     st.session_state.files_uploaded = False
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = None
 
 def check_api_health():
-    """Check if the backend API is available"""
+    """Return the backend status ("healthy", "starting" or "unhealthy"), or None if it is unreachable"""
     try:
         response = requests.get(f"{API_BASE_URL}/health", timeout=5)
-        return response.status_code == 200
+        return response.json().get('status')
     except:
-        return False
+        return None
+
+def api_headers():
+    """Headers identifying this browser session to the backend"""
+    if st.session_state.session_id:
+        return {'X-Session-Id': st.session_state.session_id}
+    return {}
+
+def remember_session(response):
+    """Keep the session id assigned by the backend for later requests"""
+    session_id = response.headers.get('X-Session-Id')
+    if session_id:
+        st.session_state.session_id = session_id
+
+def wait_for_job(job_id):
+    """Poll an ingestion job until it finishes, showing per-file progress"""
+    progress_bar = st.progress(0.0, text="Queued...")
+    file_status = st.empty()
+    
+    while True:
+        response = requests.get(f"{API_BASE_URL}/jobs/{job_id}", timeout=10)
+        response.raise_for_status()
+        job = response.json()
+        
+        files = job['files']
+        finished = sum(f['stage'] in ('done', 'skipped', 'failed') for f in files)
+        progress_bar.progress(finished / max(len(files), 1), text=f"Processed {finished} of {len(files)} files")
+        
+        lines = []
+        for f in files:
+            line = f"- **{f['filename']}** — {STAGE_LABELS[f['stage']]}"
+            if f['chunks']:
+                line += f" · {f['chunks']} chunks"
+            if f['chunks_skipped']:
+                line += f" · {f['chunks_skipped']} unchanged"
+            if f['chunks_per_second']:
+                line += f" · {f['chunks_per_second']:.1f} chunks/s"
+            lines.append(line)
+        file_status.markdown("\n".join(lines))
+        
+        if job['status'] in ('done', 'partial', 'failed'):
+            return job
+        
+        time.sleep(JOB_POLL_INTERVAL)
+
+def iter_sse_events(response):
+    """Yield (event, data) pairs from a Server-Sent Events response"""
+    event = 'message'
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith('event:'):
+            event = line[len('event:'):].strip()
+        elif line.startswith('data:'):
+            yield event, json.loads(line[len('data:'):].strip())
+            event = 'message'
+
+def render_assistant_message(placeholder, content):
+    """Render an assistant chat bubble into a placeholder"""
+    placeholder.markdown(f"""
+        <div class="chat-message assistant-message">
+            <strong>🤖 Assistant:</strong><br>
+            {content}
+        </div>
+    """, unsafe_allow_html=True)
 
 def render_header():
     """Render the header section"""
@@ -183,9 +258,16 @@ def home_page():
     render_header()
     
     # Check API health
-    if not check_api_health():
+    status = check_api_health()
+    if status is None:
         st.error("⚠️ Backend API is not available. Please ensure the FastAPI server is running.")
         return
+    if status == 'starting':
+        st.info("⏳ Backend is still loading its models. Refresh in a few seconds.")
+        return
+    if status != 'healthy':
+        st.error("⚠️ Some backend components failed to load. See /health on the API for details.")
+        return
     
     col1, col2, col3 = st.columns([1, 2, 1])
     
@@ -274,24 +356,29 @@ def upload_page():
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             if st.button("🚀 Process & Upload Files", key="process_btn", use_container_width=True):
-                with st.spinner("Processing and storing your files... This may take a moment."):
-                    try:
-                        # Prepare files for upload
-                        files_data = []
-                        for file in uploaded_files:
-                            file.seek(0)  # Reset file pointer
-                            files_data.append(
-                                ('files', (file.name, file.getvalue(), file.type))
-                            )
-                        
-                        # Send request to backend
+                try:
+                    # Prepare files for upload
+                    files_data = []
+                    for file in uploaded_files:
+                        file.seek(0)  # Reset file pointer
+                        files_data.append(
+                            ('files', (file.name, file.getvalue(), file.type))
+                        )
+                    
+                    # Submit an ingestion job; processing continues on the server
+                    with st.spinner("Uploading your files..."):
                         response = requests.post(
-                            f"{API_BASE_URL}/load_knowledge",
+                            f"{API_BASE_URL}/jobs",
                             files=files_data,
-                            timeout=300  # 5 minutes timeout for large files
+                            headers=api_headers(),
+                            timeout=300  # covers the upload transfer only
                         )
+                        remember_session(response)
+                    
+                    if response.status_code == 202:
+                        job = wait_for_job(response.json()['job_id'])
                         
-                        if response.status_code == 200:
+                        if job['status'] == 'done':
                             st.markdown("""
                                 <div class="success-box">
                                     ✅ <strong>Success!</strong> Your files have been processed and stored successfully.
@@ -305,26 +392,42 @@ def upload_page():
                             st.session_state.page = 'chat'
                             st.rerun()
                         else:
-                            error_message = response.json().get('detail', 'Unknown error occurred')
+                            failed = [f"{f['filename']}: {f['error']}" for f in job['files'] if f['stage'] == 'failed']
+                            if job['status'] == 'partial':
+                                st.session_state.files_uploaded = True
                             st.markdown(f"""
                                 <div class="error-box">
-                                    ❌ <strong>Error:</strong> {error_message}
+                                    ❌ <strong>Some files could not be processed:</strong><br>
+                                    {'<br>'.join(failed)}
                                 </div>
                             """, unsafe_allow_html=True)
-                    
-                    except requests.exceptions.Timeout:
+                    elif response.status_code == 429:
                         st.markdown("""
                             <div class="error-box">
-                                ⏱️ <strong>Timeout:</strong> The request took too long. Please try with smaller files.
+                                ⏳ <strong>Server busy:</strong> Too many documents are being processed right now. Please retry in a few seconds.
                             </div>
                         """, unsafe_allow_html=True)
-                    
-                    except Exception as e:
+                    else:
+                        error_message = response.json().get('detail', 'Unknown error occurred')
                         st.markdown(f"""
                             <div class="error-box">
-                                ❌ <strong>Error:</strong> {str(e)}
+                                ❌ <strong>Error:</strong> {error_message}
                             </div>
                         """, unsafe_allow_html=True)
+                
+                except requests.exceptions.Timeout:
+                    st.markdown("""
+                        <div class="error-box">
+                            ⏱️ <strong>Timeout:</strong> The upload took too long. Please check your connection and try again.
+                        </div>
+                    """, unsafe_allow_html=True)
+                
+                except Exception as e:
+                    st.markdown(f"""
+                        <div class="error-box">
+                            ❌ <strong>Error:</strong> {str(e)}
+                        </div>
+                    """, unsafe_allow_html=True)
 
 def chat_page():
     """Render the chat interface page"""
@@ -344,9 +447,11 @@ def chat_page():
                 response = requests.post(
                     f"{API_BASE_URL}/chat_assistant",
                     json={"query": "quit"},
+                    headers=api_headers(),
                     timeout=10
                 )
                 st.session_state.chat_history = []
+                st.session_state.session_id = None  # the backend ended this session
                 st.success("Conversation cleared!")
                 time.sleep(1)
                 st.rerun()
@@ -404,36 +509,73 @@ def chat_page():
             'content': user_input
         })
         
-        # Show loading state
-        with st.spinner("Thinking..."):
-            try:
-                # Send request to backend
-                response = requests.post(
-                    f"{API_BASE_URL}/chat_assistant",
-                    json={"query": user_input},
-                    timeout=60
-                )
-                
-                if response.status_code == 200:
-                    response_data = response.json()
-                    assistant_response = response_data.get('response', 'No response received')
-                    
-                    # Add assistant message to chat history
-                    st.session_state.chat_history.append({
-                        'role': 'assistant',
-                        'content': assistant_response
-                    })
-                    
-                    st.rerun()
-                else:
-                    error_message = response.json().get('error', 'Unknown error occurred')
-                    st.error(f"Error: {error_message}")
-            
-            except requests.exceptions.Timeout:
-                st.error("Request timeout. Please try again.")
+        st.markdown(f"""
+            <div class="chat-message user-message">
+                <strong>You:</strong><br>
+                {user_input}
+            </div>
+        """, unsafe_allow_html=True)
+        
+        assistant_placeholder = st.empty()
+        assistant_placeholder.markdown("""
+            <div class="chat-message assistant-message">
+                <strong>🤖 Assistant:</strong><br>
+                <span class="loading"></span> Searching your documents...
+            </div>
+        """, unsafe_allow_html=True)
+        
+        try:
+            # Stream tokens from the backend; the read timeout applies between events
+            response = requests.post(
+                f"{API_BASE_URL}/chat_assistant/stream",
+                json={"query": user_input},
+                headers=api_headers(),
+                stream=True,
+                timeout=(5, 60)
+            )
+            remember_session(response)
             
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
+            if response.status_code == 200 and response.headers.get('content-type', '').startswith('application/json'):
+                # "quit", "exit" or "end": the backend ended the session instead of answering
+                assistant_placeholder.empty()
+                st.session_state.chat_history = []
+                st.session_state.session_id = None
+                st.success(response.json().get('message', 'Conversation ended.'))
+                time.sleep(1)
+                st.rerun()
+            elif response.status_code == 200:
+                assistant_response = ''
+                
+                for event, data in iter_sse_events(response):
+                    if event == 'context':
+                        render_assistant_message(assistant_placeholder, '<span class="loading"></span> Writing an answer...')
+                    elif event == 'token':
+                        assistant_response += data['text']
+                        render_assistant_message(assistant_placeholder, assistant_response + ' ▌')
+                    elif event == 'done':
+                        assistant_response = data.get('response', assistant_response)
+                    elif event == 'error':
+                        raise RuntimeError(data.get('message', 'Unknown error occurred'))
+                
+                # Add assistant message to chat history
+                st.session_state.chat_history.append({
+                    'role': 'assistant',
+                    'content': assistant_response or 'No response received'
+                })
+                
+                st.rerun()
+            else:
+                assistant_placeholder.empty()
+                error_message = response.json().get('error', 'Unknown error occurred')
+                st.error(f"Error: {error_message}")
+        
+        except requests.exceptions.Timeout:
+            assistant_placeholder.empty()
+            st.error("Request timeout. Please try again.")
+        
+        except Exception as e:
+            assistant_placeholder.empty()
+            st.error(f"An error occurred: {str(e)}")
 
 # Main app logic
 def main():
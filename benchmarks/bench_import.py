@@ -0,0 +1,67 @@
+"""Measure how long it takes to import the API and to warm it up.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_import --repeat 5
+    python -m benchmarks.bench_import --warm-up
+
+Every measurement runs in a fresh interpreter, so nothing is cached between
+runs. ``--warm-up`` also times ``main.warm_up()``, which loads the
+embedding model, the chunking and prompt tokenizers, the vector index client
+and the LLM client.
+``--top`` lists the slowest modules from ``python -X importtime``.
+"""
+
+import subprocess
+import argparse
+import sys
+import re
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+WARMUP_SNIPPET = "import main, time; t = time.perf_counter(); main.warm_up(); print(time.perf_counter() - t)"
+
+
+def run_seconds(snippet : str) -> float:
+    output = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def slowest_imports(count : int):
+    """Return ``(cumulative seconds, module)`` of the slowest top-level imports of ``main``."""
+
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True).stderr
+    timings = []
+
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        # Only modules imported directly by the app's own modules (one level of nesting)
+        if match and len(match.group(2)) <= 3:
+            timings.append((int(match.group(1)) / 1e6, match.group(3)))
+
+    return sorted(timings, reverse=True)[:count]
+
+
+def summarize(name : str, samples):
+    samples = sorted(samples)
+    print(f"{name:<10} min {samples[0]:.3f}s  median {samples[len(samples) // 2]:.3f}s  max {samples[-1]:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="Also time main.warm_up() (needs the models and API keys)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    summarize("import", [run_seconds(IMPORT_SNIPPET) for _ in range(args.repeat)])
+
+    if args.warm_up:
+        summarize("warm-up", [run_seconds(WARMUP_SNIPPET) for _ in range(args.repeat)])
+
+    print("\nslowest imports:")
+    for seconds, module in slowest_imports(args.top):
+        print(f"  {seconds:7.3f}s  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare our NumPy MMR with LangChain's ``maximal_marginal_relevance``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_mmr --k 7 --lambda-mult 0.4
+
+Candidates are random vectors with a shared component, so they are
+correlated like real retrieval results. Both implementations get the same
+inputs and the script checks that they pick the same chunks, both on those
+and on independent random vectors, whose similarities are often negative.
+"""
+
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+from generation.mmr import mmr_select
+import numpy as np
+import argparse
+import time
+
+FETCH_KS = [20, 50, 100, 200, 500]
+
+
+def make_candidates(rng : np.random.Generator, fetch_k : int, dim : int, correlated : bool = True):
+    topic = rng.normal(size=dim) if correlated else np.zeros(dim)
+    candidates = topic + rng.normal(size=(fetch_k, dim))
+    query = topic + 0.5 * rng.normal(size=dim)
+    return query.astype(np.float32), candidates.astype(np.float32)
+
+
+def time_call(fn, repeat : int) -> float:
+    """Median wall time of ``fn()`` in milliseconds."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--lambda-mult", type=float, default=0.4)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 vectors have 384 dimensions")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'fetch_k':>8} {'langchain ms':>13} {'numpy ms':>9} {'speedup':>8} {'same picks':>11} {'uncorrelated':>13}")
+
+    for fetch_k in FETCH_KS:
+        query, candidates = make_candidates(rng, fetch_k, args.dim)
+
+        reference = maximal_marginal_relevance(query, candidates.tolist(), lambda_mult=args.lambda_mult, k=args.k)
+        ours = mmr_select(query, candidates, args.k, args.lambda_mult)
+
+        langchain_ms = time_call(
+            lambda: maximal_marginal_relevance(query, candidates.tolist(), lambda_mult=args.lambda_mult, k=args.k), args.repeat
+        )
+        numpy_ms = time_call(lambda: mmr_select(query, candidates, args.k, args.lambda_mult), args.repeat)
+
+        query_u, candidates_u = make_candidates(rng, fetch_k, args.dim, correlated=False)
+        same_uncorrelated = (
+            list(maximal_marginal_relevance(query_u, candidates_u.tolist(), lambda_mult=args.lambda_mult, k=args.k))
+            == mmr_select(query_u, candidates_u, args.k, args.lambda_mult)
+        )
+
+        print(f"{fetch_k:>8} {langchain_ms:>13.3f} {numpy_ms:>9.3f} {langchain_ms / numpy_ms:>7.1f}x {str(list(reference) == ours):>11} {str(same_uncorrelated):>13}")
+
+
+if __name__ == "__main__":
+    main()
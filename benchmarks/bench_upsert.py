@@ -0,0 +1,166 @@
+"""Check the upsert writer's request sizing, retries and failures, and time it on the local index.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_upsert --vectors 5000
+
+Request sizing, retries and permanent failures are checked against an
+in-memory fake index that records every request and can be told to fail.
+The same writer then upserts into a ``LocalVectorIndex`` in a temporary
+directory, which must end up holding every vector exactly once. A failed
+check stops the script with an ``AssertionError``.
+"""
+
+from embeddings.upsert_writer import UpsertWriter,estimate_size
+from embeddings.local_index import LocalVectorIndex
+from typing import Any,Dict,List
+from pathlib import Path
+import numpy as np
+import threading
+import tempfile
+import argparse
+import asyncio
+import time
+
+
+class StatusError(Exception):
+    """Error carrying an HTTP status, like the Pinecone client's exceptions."""
+
+    def __init__(self, status : int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class FakeIndex:
+    """Records upsert requests; the first ``failures`` of them raise ``StatusError(status)``."""
+
+    def __init__(self, failures : int = 0, status : int = 503):
+        self.failures = failures
+        self.status = status
+        self.requests : List[List[Dict[str, Any]]] = []
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors : List[Dict[str, Any]], namespace : str = "", **kwargs) -> Dict[str, int]:
+        with self._lock:
+            self.attempts += 1
+            if self.attempts <= self.failures:
+                raise StatusError(self.status)
+            self.requests.append(vectors)
+        return {"upserted_count": len(vectors)}
+
+
+def make_vectors(rng : np.random.Generator, count : int, dim : int, metadata : bool = False) -> List[Dict[str, Any]]:
+    values = rng.normal(size=(count, dim)).astype(np.float32)
+    vectors = [{"id": f"vec-{i:08d}", "values": row.tolist()} for i, row in enumerate(values)]
+
+    if metadata:
+        for i, vector in enumerate(vectors):
+            vector["metadata"] = {"text": "x" * int(rng.integers(0, 2000)), "page_number": i}
+    return vectors
+
+
+def writer_for(index, **kwargs) -> UpsertWriter:
+    kwargs.setdefault("backoff_seconds", 0.001)
+    return UpsertWriter(lambda: index, **kwargs)
+
+
+def check_sizing(vectors : List[Dict[str, Any]]) -> None:
+    index = FakeIndex()
+    writer = writer_for(index, max_payload_bytes=200_000, max_batch_vectors=100)
+    asyncio.run(writer.upsert(vectors, "bench"))
+
+    sent = [vector["id"] for request in index.requests for vector in request]
+    assert sorted(sent) == sorted(vector["id"] for vector in vectors), "every vector is sent exactly once"
+    assert all(len(request) <= 100 for request in index.requests), "no request exceeds max_batch_vectors"
+    assert all(
+        sum(estimate_size(vector) for vector in request) <= 200_000 for request in index.requests if len(request) > 1
+    ), "no multi-vector request exceeds max_payload_bytes"
+    assert writer.stats()["batches"] == len(index.requests)
+
+    print(f"sizing: {len(vectors)} vectors in {len(index.requests)} requests, "
+          f"largest {max(len(request) for request in index.requests)} vectors - ok")
+
+
+def check_retries(vectors : List[Dict[str, Any]]) -> None:
+    index = FakeIndex(failures=3, status=429)
+    writer = writer_for(index, max_batch_vectors=len(vectors), max_retries=5)
+    asyncio.run(writer.upsert(vectors, "bench"))
+
+    assert len(index.requests) == 1 and len(index.requests[0]) == len(vectors), "the batch lands after the retries"
+    assert writer.stats()["retries"] == 3 and writer.stats()["failed_batches"] == 0
+
+    print("retries: 3 rate-limited attempts, then stored - ok")
+
+
+def check_failures(vectors : List[Dict[str, Any]]) -> None:
+    # A bad request is not retried
+    index = FakeIndex(failures=1, status=400)
+    writer = writer_for(index, max_batch_vectors=len(vectors), max_retries=5)
+    try:
+        asyncio.run(writer.upsert(vectors, "bench"))
+        raise AssertionError("a 400 must raise")
+    except StatusError as e:
+        assert e.status == 400
+
+    assert index.attempts == 1 and writer.stats()["retries"] == 0 and writer.stats()["failed_batches"] == 1
+
+    # A server error is retried until max_retries runs out
+    index = FakeIndex(failures=10, status=503)
+    writer = writer_for(index, max_batch_vectors=len(vectors), max_retries=2)
+    try:
+        asyncio.run(writer.upsert(vectors, "bench"))
+        raise AssertionError("exhausted retries must raise")
+    except StatusError as e:
+        assert e.status == 503
+
+    assert index.attempts == 3 and writer.stats()["retries"] == 2 and writer.stats()["failed_batches"] == 1
+    assert writer.stats()["vectors"] == 0, "failed upserts are not counted as stored"
+
+    print("failures: 400 raised at once, 503 raised after 2 retries - ok")
+
+
+def check_local_index(vectors : List[Dict[str, Any]], concurrency : int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalVectorIndex(Path(tmp))
+        writer = writer_for(index, max_batch_vectors=250, concurrency=concurrency)
+
+        async def upsert_twice():
+            await writer.upsert(vectors, "bench")
+            # Upserting the same ids again must not add rows
+            await writer.upsert(vectors[: len(vectors) // 2], "bench")
+
+        # One event loop: the writer's concurrency limit belongs to the loop it first ran on
+        start = time.perf_counter()
+        asyncio.run(upsert_twice())
+        seconds = time.perf_counter() - start
+
+        stats = index.describe_index_stats()
+        assert stats["namespaces"]["bench"]["vector_count"] == len(vectors), "each id is stored once"
+
+        probe = vectors[len(vectors) // 3]
+        match = index.query(vector=probe["values"], top_k=1, namespace="bench")["matches"][0]
+        assert match["id"] == probe["id"], "a stored vector is its own nearest neighbour"
+
+    upserted = len(vectors) + len(vectors) // 2
+    print(f"local index: {upserted} upserts in {seconds:.2f}s ({upserted / seconds:,.0f} vectors/s) - ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 vectors have 384 dimensions")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    check_sizing(make_vectors(rng, args.vectors, args.dim, metadata=True))
+    check_retries(make_vectors(rng, 50, args.dim))
+    check_failures(make_vectors(rng, 50, args.dim))
+    check_local_index(make_vectors(rng, args.vectors, args.dim), args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+from embeddings.document_registry import DATA_DIR
+from collections import Counter,defaultdict
+from typing import Dict,Iterable,List,Tuple
+from dotenv import load_dotenv
+from pathlib import Path
+import numpy as np
+import threading
+import sqlite3
+import math
+import re
+import os
+
+load_dotenv()
+
+BM25_INDEX_PATH = Path(os.getenv("BM25_INDEX_PATH", DATA_DIR / "bm25.sqlite3"))
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+
+TOKEN = re.compile(r"\w+")
+MAX_TOKEN_LENGTH = 64
+
+# Very common English words; dropping them keeps the postings small without hurting ranking
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our
+she so than that the their them then there these they this to was we were what when which who will with you your
+""".split())
+
+POSTING_WIDTHS = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+
+def tokenize(text : str) -> List[str]:
+    """Lowercased word, number and identifier tokens of ``text``, without stopwords."""
+
+    return [
+        token for token in TOKEN.findall(text.lower())
+        if token not in STOPWORDS and len(token) <= MAX_TOKEN_LENGTH
+    ]
+
+
+def encode_doc_ids(doc_ids : np.ndarray) -> bytes:
+    """Delta-encode sorted doc ids in the narrowest unsigned integer type that fits."""
+
+    deltas = np.diff(doc_ids, prepend=0)
+    width = next(size for size, dtype in POSTING_WIDTHS.items() if deltas.max(initial=0) <= np.iinfo(dtype).max)
+    return bytes([width]) + deltas.astype(POSTING_WIDTHS[width]).tobytes()
+
+
+def decode_doc_ids(blob : bytes) -> np.ndarray:
+    return np.cumsum(np.frombuffer(blob, dtype=POSTING_WIDTHS[blob[0]], offset=1), dtype=np.int64)
+
+
+class BM25Index:
+    """Incremental BM25 inverted index, one per namespace, in SQLite.
+
+    Chunks get dense integer doc ids per namespace. Every added batch writes
+    one postings segment per term: delta-encoded doc ids in the narrowest
+    integer type that fits, and term frequencies capped at 255 as bytes.
+    ``compact`` merges the segments of each term into one. Searches decode
+    the postings of the query terms only and score them with NumPy.
+    """
+
+    def __init__(self, path : Path, k1 : float = BM25_K1, b : float = BM25_B):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # namespace -> document lengths indexed by doc id
+        self._lengths : Dict[str, np.ndarray] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS bm25_docs (
+                    namespace TEXT NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (namespace, doc_id),
+                    UNIQUE (namespace, chunk_id)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS bm25_postings (
+                    namespace TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    doc_ids BLOB NOT NULL,
+                    tfs BLOB NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bm25_postings_term ON bm25_postings (namespace, term)")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS bm25_stats (
+                    namespace TEXT PRIMARY KEY,
+                    doc_count INTEGER NOT NULL,
+                    total_length INTEGER NOT NULL
+                )"""
+            )
+
+    def _stats(self, namespace : str) -> Tuple[int, int]:
+        row = self._conn.execute("SELECT doc_count, total_length FROM bm25_stats WHERE namespace = ?", (namespace,)).fetchone()
+        return row if row else (0, 0)
+
+    def add(self, namespace : str, chunks : Iterable[Tuple[str, str]]) -> int:
+        """Index ``(chunk id, text)`` pairs; chunks already in the namespace are skipped. Returns the number added."""
+
+        chunks = dict(chunks)
+        if not chunks:
+            return 0
+
+        with self._lock, self._conn:
+            # Take the write lock up front: doc ids are allocated from the stats row read below
+            self._conn.execute("BEGIN IMMEDIATE")
+
+            placeholders = ",".join("?" * len(chunks))
+            known = {row[0] for row in self._conn.execute(
+                f"SELECT chunk_id FROM bm25_docs WHERE namespace = ? AND chunk_id IN ({placeholders})",
+                (namespace, *chunks)
+            )}
+
+            doc_count, total_length = self._stats(namespace)
+            docs = []
+            postings = defaultdict(list)
+
+            for chunk_id, text in chunks.items():
+                if chunk_id in known:
+                    continue
+
+                terms = Counter(tokenize(text))
+                doc_id = doc_count + len(docs)
+                docs.append((namespace, doc_id, chunk_id, sum(terms.values())))
+
+                for term, tf in terms.items():
+                    postings[term].append((doc_id, tf))
+
+            if not docs:
+                return 0
+
+            self._conn.executemany("INSERT INTO bm25_docs VALUES (?, ?, ?, ?)", docs)
+            self._conn.executemany(
+                "INSERT INTO bm25_postings VALUES (?, ?, ?, ?)",
+                [
+                    (namespace, term, encode_doc_ids(np.array([d for d, _ in entries])),
+                     np.minimum([tf for _, tf in entries], 255).astype(np.uint8).tobytes())
+                    for term, entries in postings.items()
+                ]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO bm25_stats VALUES (?, ?, ?)",
+                (namespace, doc_count + len(docs), total_length + sum(doc[3] for doc in docs))
+            )
+            self._lengths.pop(namespace, None)
+
+        return len(docs)
+
+    def compact(self, namespace : str) -> None:
+        """Merge the postings segments of every term in ``namespace`` into one row."""
+
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+
+            terms = [row[0] for row in self._conn.execute(
+                "SELECT term FROM bm25_postings WHERE namespace = ? GROUP BY term HAVING COUNT(*) > 1", (namespace,)
+            )]
+
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT doc_ids, tfs FROM bm25_postings WHERE namespace = ? AND term = ?", (namespace, term)
+                ).fetchall()
+
+                doc_ids = np.concatenate([decode_doc_ids(ids) for ids, _ in rows])
+                tfs = b"".join(tf for _, tf in rows)
+                order = np.argsort(doc_ids, kind="stable")
+
+                self._conn.execute("DELETE FROM bm25_postings WHERE namespace = ? AND term = ?", (namespace, term))
+                self._conn.execute(
+                    "INSERT INTO bm25_postings VALUES (?, ?, ?, ?)",
+                    (namespace, term, encode_doc_ids(doc_ids[order]), np.frombuffer(tfs, dtype=np.uint8)[order].tobytes())
+                )
+
+    def _doc_lengths(self, namespace : str, doc_count : int) -> np.ndarray:
+        lengths = self._lengths.get(namespace)
+
+        # Reload when another worker process has added documents since
+        if lengths is None or len(lengths) != doc_count:
+            rows = self._conn.execute("SELECT length FROM bm25_docs WHERE namespace = ? ORDER BY doc_id", (namespace,)).fetchall()
+            lengths = np.array([row[0] for row in rows], dtype=np.float32)
+            self._lengths[namespace] = lengths
+
+        return lengths
+
+    def search(self, namespace : str, query : str, top_k : int) -> List[Tuple[str, float]]:
+        """Return up to ``top_k`` ``(chunk id, BM25 score)`` pairs, best first."""
+
+        terms = sorted(set(tokenize(query)))
+        if not terms or top_k <= 0:
+            return []
+
+        with self._lock:
+            doc_count, total_length = self._stats(namespace)
+            if doc_count == 0:
+                return []
+
+            placeholders = ",".join("?" * len(terms))
+            rows = self._conn.execute(
+                f"SELECT term, doc_ids, tfs FROM bm25_postings WHERE namespace = ? AND term IN ({placeholders})",
+                (namespace, *terms)
+            ).fetchall()
+            lengths = self._doc_lengths(namespace, doc_count)
+
+        if not rows:
+            return []
+
+        segments = defaultdict(list)
+        for term, doc_ids, tfs in rows:
+            segments[term].append((decode_doc_ids(doc_ids), np.frombuffer(tfs, dtype=np.uint8)))
+
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / (total_length / doc_count))
+
+        for parts in segments.values():
+            doc_ids = np.concatenate([ids for ids, _ in parts])
+            tfs = np.concatenate([tf for _, tf in parts]).astype(np.float32)
+
+            idf = math.log(1 + (doc_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            # A doc id appears once per term, so plain fancy-index accumulation is safe
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + length_norm[doc_ids])
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits])]
+
+        with self._lock:
+            placeholders = ",".join("?" * len(hits))
+            chunk_ids = dict(self._conn.execute(
+                f"SELECT doc_id, chunk_id FROM bm25_docs WHERE namespace = ? AND doc_id IN ({placeholders})",
+                (namespace, *hits.tolist())
+            ).fetchall())
+
+        return [(chunk_ids[doc_id], float(scores[doc_id])) for doc_id in hits.tolist() if doc_id in chunk_ids]
+
+    def forget_namespace(self, namespace : str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM bm25_docs WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM bm25_postings WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM bm25_stats WHERE namespace = ?", (namespace,))
+            self._lengths.pop(namespace, None)
+
+
+bm25_index = BM25Index(BM25_INDEX_PATH)
@@ -0,0 +1,100 @@
+from embeddings.document_registry import DATA_DIR
+from collections import OrderedDict
+from typing import Any,Dict,Iterable,List,Tuple
+from dotenv import load_dotenv
+from pathlib import Path
+import threading
+import sqlite3
+import json
+import os
+
+load_dotenv()
+
+CHUNK_STORE_PATH = Path(os.getenv("CHUNK_STORE_PATH", DATA_DIR / "chunks.sqlite3"))
+CHUNK_CACHE_SIZE = int(os.getenv("CHUNK_CACHE_SIZE", 10_000))
+
+# (text, metadata)
+Chunk = Tuple[str, Dict[str, Any]]
+
+
+class ChunkStore:
+    """Text and metadata of every stored chunk, keyed by namespace and vector id.
+
+    Filled at ingestion time so the vector index only has to hold vectors:
+    searches return ids and scores, and the text is read back from here.
+    Recently read chunks are kept in an in-memory LRU of ``cache_size``
+    entries.
+    """
+
+    def __init__(self, path : Path, cache_size : int = CHUNK_CACHE_SIZE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache : "OrderedDict[Tuple[str, str], Chunk]" = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunks (
+                    namespace TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    PRIMARY KEY (namespace, chunk_id)
+                )"""
+            )
+
+    def _remember(self, key : Tuple[str, str], chunk : Chunk) -> None:
+        self._cache[key] = chunk
+        self._cache.move_to_end(key)
+
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def put_many(self, namespace : str, chunks : Iterable[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """Store ``(chunk id, text, metadata)`` triples."""
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)",
+                [(namespace, chunk_id, text, json.dumps(metadata)) for chunk_id, text, metadata in chunks]
+            )
+
+    def get_many(self, namespace : str, chunk_ids : List[str]) -> Dict[str, Chunk]:
+        """Return the chunks found for ``chunk_ids``; unknown ids are left out."""
+
+        found = {}
+        missing = []
+
+        with self._lock:
+            for chunk_id in chunk_ids:
+                key = (namespace, chunk_id)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[chunk_id] = self._cache[key]
+                else:
+                    missing.append(chunk_id)
+
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, text, metadata FROM chunks WHERE namespace = ? AND chunk_id IN ({placeholders})",
+                    (namespace, *missing)
+                ).fetchall()
+
+                for chunk_id, text, metadata in rows:
+                    found[chunk_id] = (text, json.loads(metadata))
+                    self._remember((namespace, chunk_id), found[chunk_id])
+
+        return found
+
+    def forget_namespace(self, namespace : str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+
+            for key in [key for key in self._cache if key[0] == namespace]:
+                del self._cache[key]
+
+
+chunk_store = ChunkStore(CHUNK_STORE_PATH)
@@ -0,0 +1,97 @@
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from typing import Iterable,Iterator,List
+from itertools import islice
+
+# Elements tokenized per call; fast tokenizers encode a batch in parallel
+TOKENIZE_BATCH_SIZE = 64
+
+# How far a window end may move back so it doesn't cut a word in half
+MAX_WORD_BACKOFF = 8
+
+
+class TokenChunker:
+    """Splits documents so every chunk fits the embedding model's token window.
+
+    Text beyond the window is silently truncated by the encoder, so longer
+    elements are cut into windows of ``max_tokens`` tokens overlapping by
+    ``overlap_tokens``, using the model's own tokenizer. Cuts fall on token
+    boundaries taken from the fast tokenizer's character offsets, and each
+    chunk keeps its element's metadata plus ``chunk_index``, ``start_index``
+    and ``end_index`` (character offsets into the element text). Elements
+    that already fit pass through untouched.
+    """
+
+    def __init__(self, tokenizer, max_tokens : int, overlap_tokens : int = 32):
+        self.tokenizer = tokenizer
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = min(max(0, overlap_tokens), self.max_tokens // 2)
+        self.fallback = None
+
+        if not getattr(tokenizer, "is_fast", False):
+            # Slow tokenizers give no offsets; split on characters, still measured in tokens
+            self.fallback = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+                tokenizer, chunk_size=self.max_tokens, chunk_overlap=self.overlap_tokens, add_start_index=True
+            )
+
+    def _windows(self, offsets : List[tuple]) -> Iterator[tuple]:
+        """Yield ``(start, end)`` token ranges covering ``offsets``."""
+
+        count = len(offsets)
+        start = 0
+
+        while True:
+            end = min(start + self.max_tokens, count)
+
+            if end < count:
+                # Step back while the next token continues the current word
+                floor = max(start + 1, end - MAX_WORD_BACKOFF)
+                candidate = end
+                while candidate > floor and offsets[candidate][0] == offsets[candidate - 1][1]:
+                    candidate -= 1
+                if offsets[candidate][0] != offsets[candidate - 1][1]:
+                    end = candidate
+
+            yield start, end
+
+            if end >= count:
+                return
+
+            start = max(end - self.overlap_tokens, start + 1)
+
+    def _split_batch(self, docs : List[Document]) -> Iterator[Document]:
+        encodings = self.tokenizer(
+            [doc.page_content for doc in docs],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False
+        )
+
+        for doc, offsets in zip(docs, encodings["offset_mapping"]):
+            if len(offsets) <= self.max_tokens:
+                yield doc
+                continue
+
+            for chunk_index, (start, end) in enumerate(self._windows(offsets)):
+                start_char, end_char = offsets[start][0], offsets[end - 1][1]
+
+                yield Document(
+                    page_content=doc.page_content[start_char:end_char],
+                    metadata={**doc.metadata, "chunk_index": chunk_index, "start_index": start_char, "end_index": end_char}
+                )
+
+    def split(self, docs : Iterable[Document]) -> Iterator[Document]:
+        """Lazily re-chunk ``docs``; consumes the input a batch at a time so it can stream."""
+
+        docs = iter(docs)
+
+        while True:
+            batch = list(islice(docs, TOKENIZE_BATCH_SIZE))
+            if not batch:
+                return
+
+            if self.fallback is not None:
+                yield from self.fallback.split_documents(batch)
+            else:
+                yield from self._split_batch(batch)
@@ -0,0 +1,159 @@
+from typing import Iterable,List,Set
+from dotenv import load_dotenv
+from pathlib import Path
+import threading
+import sqlite3
+import hashlib
+import time
+import os
+
+load_dotenv()
+
+DATA_DIR = Path(os.getenv("DATA_DIR", "./data"))
+DOCUMENT_REGISTRY_PATH = Path(os.getenv("DOCUMENT_REGISTRY_PATH", DATA_DIR / "registry.sqlite3"))
+
+
+def chunk_hash(text : str) -> str:
+    """Content hash of a chunk, also used as its vector id."""
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentRegistry:
+    """Persistent record of the documents and chunks stored in each namespace.
+
+    Documents are keyed by the SHA-256 of the uploaded bytes and chunks by
+    the SHA-256 of their text, so re-uploading a file skips parsing entirely
+    and an edited file only embeds the chunks that changed.
+    """
+
+    def __init__(self, path : Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS documents (
+                    namespace TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    filename TEXT,
+                    chunks INTEGER,
+                    created_at REAL,
+                    PRIMARY KEY (namespace, content_hash)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunks (
+                    namespace TEXT NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    PRIMARY KEY (namespace, chunk_hash)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS namespace_versions (
+                    namespace TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS namespace_contents (
+                    namespace TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL
+                )"""
+            )
+
+    def has_document(self, namespace : str, content_hash : str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM documents WHERE namespace = ? AND content_hash = ?",
+                (namespace, content_hash)
+            ).fetchone()
+        return row is not None
+
+    def add_document(self, namespace : str, content_hash : str, filename : str, chunks : int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                (namespace, content_hash, filename, chunks, time.time())
+            )
+
+    def known_chunks(self, namespace : str, hashes : List[str]) -> Set[str]:
+        """Return the subset of ``hashes`` already stored in ``namespace``."""
+
+        if not hashes:
+            return set()
+
+        placeholders = ",".join("?" * len(hashes))
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_hash FROM chunks WHERE namespace = ? AND chunk_hash IN ({placeholders})",
+                (namespace, *hashes)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_chunks(self, namespace : str, hashes : Iterable[str]) -> None:
+        hashes = set(hashes)
+        if not hashes:
+            return
+
+        placeholders = ",".join("?" * len(hashes))
+
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+
+            known = {row[0] for row in self._conn.execute(
+                f"SELECT chunk_hash FROM chunks WHERE namespace = ? AND chunk_hash IN ({placeholders})",
+                (namespace, *hashes)
+            )}
+            new = hashes - known
+
+            # XOR of the chunk hashes: identical chunk sets get the same digest whatever order they were stored in
+            digest = int(self._content_digest(namespace), 16)
+            for h in new:
+                digest ^= int(h, 16)
+
+            self._conn.executemany("INSERT INTO chunks VALUES (?, ?)", [(namespace, h) for h in new])
+
+            self._conn.execute("INSERT OR REPLACE INTO namespace_contents VALUES (?, ?)", (namespace, f"{digest:064x}"))
+            self._bump_version(namespace)
+
+    def forget_namespace(self, namespace : str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM namespace_contents WHERE namespace = ?", (namespace,))
+            self._bump_version(namespace)
+
+    def _content_digest(self, namespace : str) -> str:
+        row = self._conn.execute("SELECT digest FROM namespace_contents WHERE namespace = ?", (namespace,)).fetchone()
+        if row:
+            return row[0]
+
+        # Chunks stored before digests were recorded
+        digest = 0
+        for (h,) in self._conn.execute("SELECT chunk_hash FROM chunks WHERE namespace = ?", (namespace,)):
+            digest ^= int(h, 16)
+        return f"{digest:064x}"
+
+    def content_digest(self, namespace : str) -> str:
+        """Digest of the set of chunks stored in ``namespace``; namespaces holding the same chunks share it."""
+
+        with self._lock:
+            return self._content_digest(namespace)
+
+    def _bump_version(self, namespace : str) -> None:
+        # A timestamp rather than a counter, so a deleted namespace never returns to an old version
+        self._conn.execute("INSERT OR REPLACE INTO namespace_versions VALUES (?, ?)", (namespace, time.time_ns()))
+
+    def namespace_version(self, namespace : str) -> int:
+        """Value that changes whenever chunks are added to or removed from ``namespace``."""
+
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM namespace_versions WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+
+document_registry = DocumentRegistry(DOCUMENT_REGISTRY_PATH)
@@ -0,0 +1,142 @@
+from langchain_core.embeddings import Embeddings
+from embeddings.document_registry import DATA_DIR
+from typing import Any,Dict,List
+from dotenv import load_dotenv
+from pathlib import Path
+from array import array
+import threading
+import sqlite3
+import hashlib
+import time
+import os
+
+load_dotenv()
+
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", DATA_DIR / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200_000))
+
+# Hits are remembered in memory and their last_used times written once this many have piled up
+TOUCH_BATCH = 1000
+
+
+class CachedEmbeddings(Embeddings):
+    """Disk-backed LRU cache in front of an embedding model.
+
+    Vectors are stored as float32 blobs in SQLite, keyed by model name, the
+    kind of input (document or query) and the SHA-256 of the text. Once the
+    cache holds more than ``max_entries`` vectors the least recently used
+    ones are evicted. Lookups only read: the use times of hits are written
+    in batches, with the next insert or every ``TOUCH_BATCH`` hits.
+    """
+
+    def __init__(self, underlying : Embeddings, model_name : str, path : Path = EMBEDDING_CACHE_PATH, max_entries : int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._touched : Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used)")
+            self._size = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def _key(self, kind : str, text : str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get_many(self, keys : List[str]) -> Dict[str, List[float]]:
+        placeholders = ",".join("?" * len(keys))
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", keys
+            ).fetchall()
+
+            now = time.time()
+            self._touched.update((key, now) for key, _ in rows)
+
+            if len(self._touched) >= TOUCH_BATCH:
+                with self._conn:
+                    self._write_touches()
+
+        return {key: array("f", blob).tolist() for key, blob in rows}
+
+    def _write_touches(self) -> None:
+        self._conn.executemany(
+            "UPDATE vectors SET last_used = ? WHERE key = ?", [(used, key) for key, used in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def _put_many(self, items : Dict[str, List[float]]) -> None:
+        now = time.time()
+        placeholders = ",".join("?" * len(items))
+
+        with self._lock, self._conn:
+            # Use times go in first, so eviction below sees which vectors are still in use
+            self._write_touches()
+
+            # Another worker may have inserted some of these already; REPLACE doesn't add rows for them
+            existing = self._conn.execute(
+                f"SELECT COUNT(*) FROM vectors WHERE key IN ({placeholders})", list(items)
+            ).fetchone()[0]
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+            )
+            self._size += len(items) - existing
+
+            if self._size > self.max_entries:
+                # Evict a little more than needed so we don't evict on every insert
+                excess = self._size - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self._size = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def _embed(self, kind : str, texts : List[str], compute) -> List[List[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        unique = dict(zip(keys, texts))
+
+        found = self._get_many(list(unique))
+        missing = {key: text for key, text in unique.items() if key not in found}
+
+        if missing:
+            computed = compute(list(missing.values()))
+            new_vectors = dict(zip(missing, computed))
+            self._put_many(new_vectors)
+            found.update(new_vectors)
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts : List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed("document", texts, self.underlying.embed_documents)
+
+    def embed_query(self, text : str) -> List[float]:
+        return self._embed("query", [text], lambda texts: [self.underlying.embed_query(texts[0])])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": self._size,
+                "max_entries": self.max_entries,
+            }
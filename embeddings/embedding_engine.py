@@ -0,0 +1,154 @@
+from langchain_core.embeddings import Embeddings
+from embeddings.lazy import LazyResource
+from typing import Any,Dict,List
+from dotenv import load_dotenv
+import numpy as np
+import threading
+import time
+import os
+
+load_dotenv()
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))  # 0 keeps the torch default
+EMBEDDING_SORT_BY_LENGTH = os.getenv("EMBEDDING_SORT_BY_LENGTH", "true").lower() == "true"
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+
+# "torch", "onnx" or "onnx-int8"; the ONNX backends need `optimum[onnxruntime]`
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Local directory produced by `python -m embeddings.onnx_export`; defaults to the hub model
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR")
+
+ONNX_FILES = {
+    "onnx": os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx"),
+    "onnx-int8": os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_qint8_avx512_vnni.onnx"),
+}
+
+
+def load_sentence_transformer(model_name : str, backend : str = "torch", device : str = "cpu", model_dir : str = None):
+    """Load ``model_name`` (or its local export in ``model_dir``) with the given backend."""
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_dir or model_name, device=device)
+
+    if backend not in ONNX_FILES:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of: torch, {', '.join(ONNX_FILES)}")
+
+    return SentenceTransformer(
+        model_dir or model_name,
+        device=device,
+        backend="onnx",
+        model_kwargs={"file_name": ONNX_FILES[backend]}
+    )
+
+
+def check_parity(reference, candidate, texts : List[str]) -> Dict[str, float]:
+    """Compare two sentence-transformers on ``texts`` by per-text cosine similarity."""
+
+    expected = reference.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    actual = candidate.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    cosine = np.sum(expected * actual, axis=1)
+
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+class EmbeddingEngine(Embeddings):
+    """Sentence-transformer encoder with explicit knobs for CPU hosts.
+
+    Texts are optionally sorted by length so each batch pads to similar
+    sizes, encoded ``batch_size`` at a time, and returned as L2-normalised
+    float32 vectors in the caller's original order. The model (and torch)
+    is only loaded on first use, so constructing the engine is cheap.
+    """
+
+    def __init__(self, model_name : str, batch_size : int = EMBEDDING_BATCH_SIZE, num_threads : int = EMBEDDING_THREADS,
+                 sort_by_length : bool = EMBEDDING_SORT_BY_LENGTH, device : str = EMBEDDING_DEVICE,
+                 backend : str = EMBEDDING_BACKEND, model_dir : str = EMBEDDING_MODEL_DIR):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.num_threads = num_threads
+        self.sort_by_length = sort_by_length
+        self.backend = backend
+        self.device = device
+        self.model_dir = model_dir
+        self.resource = LazyResource("embedding_model", self._load)
+
+        self._lock = threading.Lock()
+        self._chunks = 0
+        self._seconds = 0.0
+        self._last_rate = 0.0
+
+    def _load(self):
+        import torch
+
+        if self.num_threads > 0:
+            torch.set_num_threads(self.num_threads)
+        self.num_threads = torch.get_num_threads()
+
+        return load_sentence_transformer(self.model_name, self.backend, self.device, self.model_dir)
+
+    @property
+    def model(self):
+        return self.resource.get()
+
+    def encode(self, texts : List[str]) -> np.ndarray:
+        """Encode ``texts`` into a ``(len(texts), dim)`` float32 matrix."""
+
+        started = time.perf_counter()
+
+        if self.sort_by_length:
+            order = np.argsort([-len(text) for text in texts], kind="stable")
+        else:
+            order = np.arange(len(texts))
+
+        model = self.model
+        vectors = None
+
+        for start in range(0, len(texts), self.batch_size):
+            positions = order[start:start + self.batch_size]
+            encoded = model.encode(
+                [texts[i] for i in positions],
+                batch_size=len(positions),
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[positions] = encoded
+
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._chunks += len(texts)
+            self._seconds += elapsed
+            self._last_rate = len(texts) / elapsed if elapsed > 0 else 0.0
+
+        return vectors if vectors is not None else np.empty((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts : List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text : str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def throughput(self) -> Dict[str, Any]:
+        """Chunks encoded so far and the resulting chunks/sec."""
+
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "batch_size": self.batch_size,
+                "threads": self.num_threads,
+                "sort_by_length": self.sort_by_length,
+                "chunks": self._chunks,
+                "seconds": round(self._seconds, 3),
+                "chunks_per_second": self._chunks / self._seconds if self._seconds else 0.0,
+                "last_call_chunks_per_second": self._last_rate,
+            }
@@ -0,0 +1,104 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any,Callable,Dict
+from dotenv import load_dotenv
+import multiprocessing
+import threading
+import asyncio
+import os
+
+load_dotenv()
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", os.cpu_count() or 1))
+INGESTION_QUEUE_DEPTH = int(os.getenv("INGESTION_QUEUE_DEPTH", 16))
+INGESTION_START_METHOD = os.getenv("INGESTION_START_METHOD", "spawn")
+
+
+class IngestionQueueFull(Exception):
+    """Raised when the ingestion executor cannot accept more files."""
+
+
+class IngestionExecutor:
+    """Process pool for CPU-bound document parsing with a bounded backlog.
+
+    Callers reserve one slot per file before submitting work. At most
+    ``max_workers`` files are parsed at once and up to ``queue_depth`` more
+    wait for a free worker; anything beyond that is rejected so the API can
+    answer with 429 instead of piling up work.
+    """
+
+    def __init__(self, max_workers : int, queue_depth : int, start_method : str = "spawn"):
+        self.max_workers = max(1, max_workers)
+        self.queue_depth = max(0, queue_depth)
+        self.start_method = start_method
+        self._pool = None
+        self._lock = threading.Lock()
+        self._reserved = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_depth
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # "spawn" keeps torch / tokenizer threads of the API process out of the workers
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._pool
+
+    def reserve(self, slots : int = 1) -> None:
+        with self._lock:
+            if self._reserved + slots > self.capacity:
+                raise IngestionQueueFull(
+                    f"Ingestion queue is full ({self._reserved}/{self.capacity} files in flight). Please retry later."
+                )
+            self._reserved += slots
+
+    def release(self, slots : int = 1) -> None:
+        with self._lock:
+            self._reserved = max(0, self._reserved - slots)
+
+    @contextmanager
+    def reservation(self, slots : int = 1):
+        self.reserve(slots)
+        try:
+            yield
+        finally:
+            self.release(slots)
+
+    async def run(self, fn : Callable[..., Any], *args : Any) -> Any:
+        """Run ``fn(*args)`` in a worker process without blocking the event loop."""
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge scan); start a fresh pool for the next file
+            with self._lock:
+                self._pool = None
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            running = min(self._reserved, self.max_workers)
+            return {
+                "workers": self.max_workers,
+                "running": running,
+                "queued": self._reserved - running,
+                "capacity": self.capacity,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+ingestion_executor = IngestionExecutor(INGESTION_WORKERS, INGESTION_QUEUE_DEPTH, INGESTION_START_METHOD)
@@ -0,0 +1,275 @@
+from schema.schema_models import IngestionJob,FileProgress
+from embeddings.process_and_load import load_document
+from embeddings.vectorstore import split_store_documents,chunker
+from embeddings.document_registry import DATA_DIR,document_registry
+from embeddings.ingestion_executor import ingestion_executor,INGESTION_WORKERS
+from typing import Dict,List,Optional,Set,Tuple
+from dotenv import load_dotenv
+from pathlib import Path
+import threading
+import asyncio
+import sqlite3
+import shutil
+import time
+import uuid
+import os
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", INGESTION_WORKERS))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 3600))
+JOB_STORE_PATH = Path(os.getenv("JOB_STORE_PATH", DATA_DIR / "jobs.sqlite3"))
+# Seconds between writes of running jobs' progress to the job store
+JOB_PUBLISH_INTERVAL = float(os.getenv("JOB_PUBLISH_INTERVAL", 1))
+
+
+class JobStore:
+    """Job progress in a SQLite file, so every uvicorn worker can answer ``GET /jobs/{job_id}``."""
+
+    def __init__(self, path : Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    finished INTEGER NOT NULL
+                )"""
+            )
+
+    def put(self, job_id : str, state : str, created_at : float, finished : bool) -> None:
+        # A periodic write that lands after the final one must not reopen a finished job
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO jobs VALUES (?, ?, ?, ?)
+                   ON CONFLICT (job_id) DO UPDATE SET state = excluded.state, finished = excluded.finished
+                   WHERE jobs.finished = 0""",
+                (job_id, state, created_at, int(finished))
+            )
+
+    def get(self, job_id : str) -> Optional[IngestionJob]:
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return IngestionJob.model_validate_json(row[0]) if row else None
+
+    def prune(self, cutoff : float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE finished = 1 AND created_at < ?", (cutoff,))
+
+
+class IngestionJobManager:
+    """In-process queue that ingests uploaded files in the background.
+
+    Each file of a job is queued on its own, so the worker coroutines
+    pipeline the parsing of one file with the storing of another. The
+    worker that runs a job keeps its state in memory and publishes it to
+    ``store`` on every stage change and every ``publish_interval`` seconds
+    while it runs, so ``GET /jobs/{job_id}`` works from any worker.
+    """
+
+    def __init__(self, workers : int, retention_seconds : int, store : JobStore, publish_interval : float = JOB_PUBLISH_INTERVAL):
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self.store = store
+        self.publish_interval = publish_interval
+        self.jobs : Dict[str, IngestionJob] = {}
+        self._job_dirs : Dict[str, Path] = {}
+        self._namespaces : Dict[str, str] = {}
+        self._remaining : Dict[str, int] = {}
+        self._done : Dict[str, asyncio.Event] = {}
+        self._dirty : Set[str] = set()
+        self._queue : Optional[asyncio.Queue] = None
+        self._tasks : List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._publisher()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    async def submit(self, job_id : str, job_dir : Path, files : List[Tuple[str, Path, int, str]], namespace : str) -> IngestionJob:
+        """Queue spooled files as ``(filename, path, size, content_hash)`` for storage in ``namespace``.
+
+        The caller must hold one ``ingestion_executor`` slot per file; the
+        manager releases each slot once that file is finished.
+        """
+
+        await self._prune()
+
+        job = IngestionJob(
+            job_id=job_id,
+            created_at=time.time(),
+            files=[
+                FileProgress(filename=filename, size_bytes=size, content_hash=content_hash)
+                for filename, _, size, content_hash in files
+            ]
+        )
+
+        self.jobs[job_id] = job
+        self._job_dirs[job_id] = job_dir
+        self._namespaces[job_id] = namespace
+        self._remaining[job_id] = len(files)
+        self._done[job_id] = asyncio.Event()
+
+        # Published right away, so a poll that reaches another worker finds the job
+        try:
+            await self._publish(job)
+        except Exception as e:
+            print(f"Error publishing job {job_id}: {str(e)}")
+
+        if not files:
+            await self._finish_job(job)
+
+        for progress, (_, file_path, _, _) in zip(job.files, files):
+            self._queue.put_nowait((job, progress, file_path))
+
+        return job
+
+    def get(self, job_id : str) -> Optional[IngestionJob]:
+        """Blocking when the job runs in another worker: it is read from the job store."""
+
+        job = self.jobs.get(job_id) or self.store.get(job_id)
+
+        if job is not None:
+            for progress in job.files:
+                self._refresh_metrics(progress)
+
+        return job
+
+    async def _publish(self, job : IngestionJob) -> None:
+        self._dirty.discard(job.job_id)
+        finished = job.status in ("done", "partial", "failed")
+        await asyncio.to_thread(self.store.put, job.job_id, job.model_dump_json(), job.created_at, finished)
+
+    async def _publisher(self) -> None:
+        while True:
+            await asyncio.sleep(self.publish_interval)
+
+            for job_id in list(self._dirty):
+                job = self.jobs.get(job_id)
+                if job is None:
+                    self._dirty.discard(job_id)
+                    continue
+
+                try:
+                    await self._publish(job)
+                except Exception as e:
+                    print(f"Error publishing job {job_id}: {str(e)}")
+
+    async def wait(self, job_id : str) -> IngestionJob:
+        await self._done[job_id].wait()
+        return self.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job, progress, file_path = await self._queue.get()
+
+            try:
+                await self._process_file(job, progress, file_path)
+            finally:
+                ingestion_executor.release()
+                self._queue.task_done()
+
+                self._remaining[job.job_id] -= 1
+                if self._remaining[job.job_id] == 0:
+                    await self._finish_job(job)
+
+    async def _process_file(self, job : IngestionJob, progress : FileProgress, file_path : Path) -> None:
+        job.status = "running"
+        progress.started_at = time.time()
+        namespace = self._namespaces[job.job_id]
+
+        def set_stage(stage : str) -> None:
+            progress.stage = stage
+            self._dirty.add(job.job_id)
+
+        try:
+            if await asyncio.to_thread(document_registry.has_document, namespace, progress.content_hash):
+                # Same bytes already stored in this namespace: nothing to parse or embed
+                set_stage("skipped")
+                return
+
+            set_stage("parsing")
+            loaded_docs = await load_document(file_path)
+
+            def on_batch_stored(stored : int, skipped : int) -> None:
+                progress.chunks += stored
+                progress.chunks_skipped += skipped
+                self._dirty.add(job.job_id)
+
+            set_stage("storing")
+            # Loads the embedding model's tokenizer if the warm-up hasn't yet; keep that off the event loop
+            token_chunker = await asyncio.to_thread(chunker.get)
+            await split_store_documents(token_chunker.split(loaded_docs), namespace=namespace, on_batch_stored=on_batch_stored)
+
+            await asyncio.to_thread(
+                document_registry.add_document, namespace, progress.content_hash, progress.filename, progress.chunks + progress.chunks_skipped
+            )
+            set_stage("done")
+
+        except Exception as e:
+            print(f"Error ingesting {progress.filename} (job {job.job_id}): {str(e)}")
+            progress.error = str(getattr(e, "detail", None) or e)
+            set_stage("failed")
+
+        finally:
+            progress.finished_at = time.time()
+            self._refresh_metrics(progress)
+
+    def _refresh_metrics(self, progress : FileProgress) -> None:
+        if progress.started_at is None:
+            return
+
+        progress.elapsed_seconds = (progress.finished_at or time.time()) - progress.started_at
+
+        if progress.elapsed_seconds > 0 and progress.stage in ("storing", "done"):
+            progress.bytes_per_second = progress.size_bytes / progress.elapsed_seconds
+            progress.chunks_per_second = (progress.chunks + progress.chunks_skipped) / progress.elapsed_seconds
+
+    async def _finish_job(self, job : IngestionJob) -> None:
+        failed = sum(progress.stage == "failed" for progress in job.files)
+
+        if failed == 0:
+            job.status = "done"
+        elif failed == len(job.files):
+            job.status = "failed"
+        else:
+            job.status = "partial"
+
+        await asyncio.to_thread(shutil.rmtree, self._job_dirs.pop(job.job_id), ignore_errors=True)
+
+        try:
+            await self._publish(job)
+        except Exception as e:
+            print(f"Error publishing job {job.job_id}: {str(e)}")
+
+        self._done[job.job_id].set()
+
+    async def _prune(self) -> None:
+        """Forget finished jobs older than the retention window."""
+
+        cutoff = time.time() - self.retention_seconds
+        await asyncio.to_thread(self.store.prune, cutoff)
+
+        for job_id, job in list(self.jobs.items()):
+            if self._done[job_id].is_set() and job.created_at < cutoff:
+                del self.jobs[job_id]
+                del self._done[job_id]
+                del self._remaining[job_id]
+                del self._namespaces[job_id]
+
+
+job_manager = IngestionJobManager(JOB_WORKERS, JOB_RETENTION_SECONDS, JobStore(JOB_STORE_PATH))
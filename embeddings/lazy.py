@@ -0,0 +1,59 @@
+from typing import Any,Callable,Dict,Generic,Optional,TypeVar
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class LazyResource(Generic[T]):
+    """A heavy resource (model, client, index) built on first use.
+
+    ``get()`` may be called from any thread; the factory runs exactly once
+    and concurrent callers wait for it. A failed build is recorded and
+    retried by the next call, or, with ``retry_seconds``, by the first call
+    after that many seconds; calls in between raise at once. ``status()``
+    feeds the ``/health`` endpoint.
+    """
+
+    def __init__(self, name : str, factory : Callable[[], T], retry_seconds : float = 0):
+        self.name = name
+        self.factory = factory
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._value : Optional[T] = None
+        self._ready = False
+        self._failed_at : Optional[float] = None
+        self.load_seconds : Optional[float] = None
+        self.error : Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+
+        with self._lock:
+            if not self._ready:
+                if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_seconds:
+                    raise RuntimeError(f"{self.name} is unavailable: {self.error}")
+
+                started = time.perf_counter()
+
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    self._failed_at = time.monotonic()
+                    raise
+
+                self.load_seconds = time.perf_counter() - started
+                self.error = None
+                self._failed_at = None
+                self._ready = True
+
+        return self._value
+
+    def status(self) -> Dict[str, Any]:
+        return {"ready": self._ready, "load_seconds": self.load_seconds, "error": self.error}
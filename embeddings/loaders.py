@@ -0,0 +1,156 @@
+from typing import Any,Callable,Dict,Iterable,Iterator,List,Tuple
+from pathlib import Path
+import codecs
+import csv
+import re
+
+# Same cap as Unstructured's by_title chunking in parse_document
+MAX_CHARACTERS = 4000
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE = re.compile(r"^\s*(```|~~~)")
+
+Element = Tuple[str, Dict[str, Any]]
+
+
+def _encoding(path : Path) -> str:
+    """UTF-8 when the whole file decodes as such, otherwise the encoding Unstructured detects (e.g. cp1252)."""
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                decoder.decode(block)
+        decoder.decode(b"", final=True)
+        return "utf-8-sig"
+
+    except UnicodeDecodeError:
+        from unstructured.file_utils.encoding import detect_file_encoding
+
+        try:
+            return detect_file_encoding(str(path))[0]
+        except UnicodeDecodeError:
+            # Every byte is a cp1252 character or gets replaced, so the text is never lost wholesale
+            return "cp1252"
+
+
+def _open_text(path : Path):
+    return open(path, encoding=_encoding(path), errors="replace", newline="")
+
+
+def _pack(pieces : Iterable[str], max_characters : int = MAX_CHARACTERS, separator : str = "\n\n") -> Iterator[str]:
+    """Join consecutive ``pieces`` into texts of at most ``max_characters``; oversized pieces are cut."""
+
+    current : List[str] = []
+    size = 0
+
+    for piece in pieces:
+        # Flush first, so the text keeps its order when an oversized piece is cut
+        if current and size + len(separator) + len(piece) > max_characters:
+            yield separator.join(current)
+            current, size = [], 0
+
+        while len(piece) > max_characters:
+            yield piece[:max_characters]
+            piece = piece[max_characters:]
+
+        size += len(piece) + (len(separator) if current else 0)
+        current.append(piece)
+
+    if current:
+        yield separator.join(current)
+
+
+def _paragraphs(lines : Iterable[str]) -> Iterator[str]:
+    """Yield the blank-line separated paragraphs of ``lines``."""
+
+    paragraph : List[str] = []
+
+    for line in lines:
+        if line.strip():
+            paragraph.append(line.rstrip())
+        elif paragraph:
+            yield "\n".join(paragraph)
+            paragraph = []
+
+    if paragraph:
+        yield "\n".join(paragraph)
+
+
+def load_text(path : Path) -> Iterator[Element]:
+    with _open_text(path) as f:
+        for text in _pack(_paragraphs(f)):
+            yield text, {}
+
+
+def load_markdown(path : Path) -> Iterator[Element]:
+    """Chunk a Markdown file by section, starting a new chunk at every heading like ``by_title``."""
+
+    def sections(lines : Iterable[str]) -> Iterator[Tuple[str, List[str]]]:
+        title, body, in_code = "", [], False
+
+        for line in lines:
+            if FENCE.match(line):
+                in_code = not in_code
+
+            heading = None if in_code else HEADING.match(line)
+            if heading:
+                if any(l.strip() for l in body):
+                    yield title, body
+                title, body = heading.group(2), [line]
+            else:
+                body.append(line)
+
+        if any(l.strip() for l in body):
+            yield title, body
+
+    with _open_text(path) as f:
+        for title, body in sections(f):
+            for text in _pack(_paragraphs(body)):
+                yield text, {"section": title} if title else {}
+
+
+def load_csv(path : Path) -> Iterator[Element]:
+    """Chunk a CSV file by rows, each row written as ``column: value`` pairs."""
+
+    with _open_text(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        rows : List[str] = []
+        first_row = 1
+        size = 0
+
+        for row_number, row in enumerate(reader, start=1):
+            pairs = [f"{column}: {value}" for column, value in zip(header, row) if value.strip()]
+            line = ", ".join(pairs)
+
+            if rows and size + len(line) + 1 > MAX_CHARACTERS:
+                yield "\n".join(rows), {"row_start": first_row, "row_end": row_number - 1}
+                rows, size, first_row = [], 0, row_number
+
+            if len(line) > MAX_CHARACTERS:
+                # A row too wide for one chunk is split between its columns rather than truncated
+                for text in _pack(pairs, separator=", "):
+                    yield text, {"row_start": row_number, "row_end": row_number}
+                first_row = row_number + 1
+                continue
+
+            rows.append(line)
+            size += len(line) + 1
+
+        if rows:
+            yield "\n".join(rows), {"row_start": first_row, "row_end": first_row + len(rows) - 1}
+
+
+# Formats that need no layout analysis; everything else goes through Unstructured
+FAST_LOADERS : Dict[str, Tuple[str, Callable[[Path], Iterator[Element]]]] = {
+    ".txt": ("text/plain", load_text),
+    ".text": ("text/plain", load_text),
+    ".md": ("text/markdown", load_markdown),
+    ".markdown": ("text/markdown", load_markdown),
+    ".csv": ("text/csv", load_csv),
+}
@@ -0,0 +1,461 @@
+from embeddings.document_registry import DATA_DIR
+from typing import Any,Dict,Iterable,List,Optional,Tuple
+from dotenv import load_dotenv
+from pathlib import Path
+import numpy as np
+import threading
+import shutil
+import time
+import json
+import os
+
+load_dotenv()
+
+LOCAL_INDEX_DIR = Path(os.getenv("LOCAL_INDEX_DIR", DATA_DIR / "local_index"))
+# Namespaces with at least this many vectors are searched through HNSW (needs `hnswlib`)
+LOCAL_INDEX_HNSW_THRESHOLD = int(os.getenv("LOCAL_INDEX_HNSW_THRESHOLD", 50_000))
+LOCAL_INDEX_HNSW_SAVE_INTERVAL = int(os.getenv("LOCAL_INDEX_HNSW_SAVE_INTERVAL", 60))
+
+
+try:
+    import fcntl
+
+    def _lock_file(handle) -> None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(handle) -> None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(handle) -> None:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(handle) -> None:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Exclusive lock on ``path`` shared by every process (and thread) using the index; reentrant."""
+
+    def __init__(self, path : Path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._handle = None
+
+    def __enter__(self) -> "FileLock":
+        self._thread_lock.acquire()
+        self._depth += 1
+
+        if self._depth == 1:
+            try:
+                self._handle = open(self.path, "a+b")
+                _lock_file(self._handle)
+            except BaseException:
+                self._depth -= 1
+                self._thread_lock.release()
+                raise
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+
+        if self._depth == 0:
+            _unlock_file(self._handle)
+            self._handle.close()
+            self._handle = None
+
+        self._thread_lock.release()
+
+
+def _normalize(matrix : np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class LocalNamespace:
+    """Vectors of one namespace, persisted under ``path``.
+
+    ``vectors.f32`` is an append-only float32 matrix read through a memory
+    map and ``records.jsonl`` an append-only log of ids, metadata and
+    deletions. Vectors are stored L2-normalised so a dot product is the
+    cosine score. Small namespaces are searched exactly; large ones through
+    an HNSW graph when ``hnswlib`` is installed.
+
+    Several processes (uvicorn workers) may share the files: writes hold
+    ``file_lock`` and first replay the records other processes appended,
+    so row numbers stay consistent, and reads replay them whenever the log
+    has grown.
+    """
+
+    def __init__(self, path : Path, file_lock : FileLock):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._file_lock = file_lock
+        self._vectors_file = self.path / "vectors.f32"
+        self._records_file = self.path / "records.jsonl"
+        self._hnsw_file = self.path / "hnsw.bin"
+
+        self._reset()
+
+        with self._lock, self._file_lock:
+            self._sync()
+
+    def _reset(self) -> None:
+        self.dimension : Optional[int] = None
+        self.ids : List[str] = []
+        self.metadata : List[Dict[str, Any]] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.rows : Dict[str, int] = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+        self._hnsw = None
+        self._hnsw_saved_at = 0.0
+        # Bytes of records.jsonl applied so far, and which file they came from
+        self._records_offset = 0
+        self._records_inode = None
+
+    def _log_state(self) -> Tuple[Optional[int], int]:
+        try:
+            stat = self._records_file.stat()
+        except FileNotFoundError:
+            return None, 0
+        return stat.st_ino, stat.st_size
+
+    def refresh(self) -> None:
+        """Replay records appended by other processes, if there are any."""
+
+        inode, size = self._log_state()
+        if (inode, size) != (self._records_inode, self._records_offset) and (inode or self._records_inode):
+            with self._lock, self._file_lock:
+                self._sync()
+
+    def _sync(self) -> None:
+        """Apply the records appended since the last call. Hold both locks."""
+
+        inode, size = self._log_state()
+
+        # The namespace was deleted (and maybe recreated) by another process
+        if self._records_inode is not None and (inode != self._records_inode or size < self._records_offset):
+            self._reset()
+
+        if inode is None:
+            return
+
+        with open(self._records_file, "rb") as log:
+            log.seek(self._records_offset)
+            data = log.read()
+
+        # Only whole lines; a torn last line (a crash mid-write) is left for the next writer to overwrite
+        data = data[:data.rfind(b"\n") + 1]
+        self._records_inode = inode
+        self._records_offset += len(data)
+
+        if not data:
+            return
+
+        added, changed, deleted = [], [], []
+
+        for line in data.decode("utf-8").splitlines():
+            record = json.loads(line)
+
+            if "dimension" in record:
+                self.dimension = record["dimension"]
+            elif record.get("deleted"):
+                row = self.rows.pop(record["id"], None)
+                if row is not None:
+                    deleted.append(row)
+            else:
+                row = record["row"]
+                if row == len(self.ids):
+                    self.ids.append(record["id"])
+                    self.metadata.append(record["metadata"])
+                    added.append(row)
+                else:
+                    self.ids[row] = record["id"]
+                    self.metadata[row] = record["metadata"]
+                    changed.append(row)
+                self.rows[record["id"]] = row
+
+        self.alive = np.zeros(len(self.ids), dtype=bool)
+        self.alive[list(self.rows.values())] = True
+        self._remap()
+
+        if self._hnsw is not None:
+            for row in deleted:
+                self._mark_hnsw_deleted(row)
+
+        # Large namespaces are searched through their saved graph right away, not only after the next upsert
+        if self.dimension:
+            self._update_hnsw(added, changed)
+
+    def _remap(self) -> None:
+        if self.dimension and self.ids:
+            self.matrix = np.memmap(self._vectors_file, dtype=np.float32, mode="r", shape=(len(self.ids), self.dimension))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def upsert(self, vectors : List[Tuple[str, List[float], Dict[str, Any]]]) -> int:
+        with self._lock, self._file_lock:
+            self._sync()
+            self.path.mkdir(parents=True, exist_ok=True)
+
+            # Drop rows written after the last record (e.g. a crash mid-upsert) so appends stay aligned
+            expected = len(self.ids) * (self.dimension or 0) * 4
+            if self._vectors_file.exists() and self._vectors_file.stat().st_size > expected:
+                os.truncate(self._vectors_file, expected)
+
+            # Last write wins for ids repeated within the batch
+            vectors = list({vector[0]: vector for vector in vectors}.values())
+            values = _normalize(np.asarray([values for _, values, _ in vectors], dtype=np.float32))
+
+            if self.dimension is None:
+                self.dimension = values.shape[1]
+                self._append_records([{"dimension": self.dimension}])
+            elif values.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match index dimension {self.dimension}")
+
+            stored_rows = len(self.ids)
+            records, overwritten, appended = [], [], []
+
+            for (vector_id, _, metadata), vector in zip(vectors, values):
+                row = self.rows.get(vector_id)
+
+                if row is None:
+                    row = len(self.ids)
+                    self.ids.append(vector_id)
+                    self.metadata.append(metadata)
+                    self.rows[vector_id] = row
+                    appended.append((row, vector))
+                else:
+                    self.metadata[row] = metadata
+                    overwritten.append((row, vector))
+
+                records.append({"id": vector_id, "row": row, "metadata": metadata})
+
+            if overwritten:
+                # Overwrite rows in place; the matrix file only ever grows
+                writable = np.memmap(self._vectors_file, dtype=np.float32, mode="r+", shape=(stored_rows, self.dimension))
+                for row, vector in overwritten:
+                    writable[row] = vector
+                writable.flush()
+
+            if appended:
+                with open(self._vectors_file, "ab") as matrix_file:
+                    matrix_file.write(np.asarray([vector for _, vector in appended], dtype=np.float32).tobytes())
+
+                self.alive = np.concatenate([self.alive, np.ones(len(appended), dtype=bool)])
+
+            self._append_records(records)
+            self._remap()
+            self._update_hnsw([row for row, _ in appended], [row for row, _ in overwritten])
+
+            return len(vectors)
+
+    def delete(self, ids : Iterable[str]) -> None:
+        with self._lock, self._file_lock:
+            self._sync()
+            records = []
+
+            for vector_id in ids:
+                row = self.rows.pop(vector_id, None)
+                if row is None:
+                    continue
+
+                self.alive[row] = False
+                records.append({"id": vector_id, "deleted": True})
+
+                if self._hnsw is not None:
+                    self._mark_hnsw_deleted(row)
+
+            self._append_records(records)
+
+    def _update_hnsw(self, new_rows : List[int], changed_rows : List[int]) -> None:
+        # Once a graph exists it serves every query, so it keeps taking new rows even if deletes shrink the namespace
+        if self._hnsw is None and len(self) < LOCAL_INDEX_HNSW_THRESHOLD:
+            return
+
+        try:
+            import hnswlib
+        except ImportError:
+            return
+
+        if self._hnsw is None:
+            # Inner product on normalised vectors is cosine similarity
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dimension)
+
+            if self._hnsw_file.exists():
+                self._hnsw.load_index(str(self._hnsw_file), max_elements=len(self.ids) * 2)
+                self._hnsw_saved_at = time.time()
+            else:
+                self._hnsw.init_index(max_elements=len(self.ids) * 2, ef_construction=200, M=16)
+
+            # Vector ids are content hashes, so rows saved in the graph never change values
+            new_rows = list(range(self._hnsw.get_current_count(), len(self.ids)))
+            changed_rows = []
+
+            for row in np.flatnonzero(~self.alive[:self._hnsw.get_current_count()]):
+                self._mark_hnsw_deleted(int(row))
+
+        rows = new_rows + changed_rows
+        if rows:
+            if self._hnsw.get_current_count() + len(new_rows) > self._hnsw.get_max_elements():
+                self._hnsw.resize_index(len(self.ids) * 2)
+
+            self._hnsw.add_items(self.matrix[rows], rows)
+
+            for row in rows:
+                if not self.alive[row]:
+                    self._mark_hnsw_deleted(row)
+
+        if time.time() - self._hnsw_saved_at > LOCAL_INDEX_HNSW_SAVE_INTERVAL:
+            self._hnsw.save_index(str(self._hnsw_file))
+            self._hnsw_saved_at = time.time()
+
+    def _mark_hnsw_deleted(self, row : int) -> None:
+        try:
+            self._hnsw.mark_deleted(row)
+        except RuntimeError:
+            pass  # already deleted
+
+    def _append_records(self, records : List[Dict[str, Any]]) -> None:
+        """Append to the log right after the records already applied. Hold both locks, after ``_sync``."""
+
+        if not records:
+            return
+
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+        with open(self._records_file, "r+b" if self._records_file.exists() else "wb") as log:
+            # Overwrites a torn line left by a crash, which _sync never applied
+            log.seek(self._records_offset)
+            log.write(data)
+            log.truncate()
+
+        self._records_inode = self._records_file.stat().st_ino
+        self._records_offset += len(data)
+
+    def query(self, vector : List[float], top_k : int) -> List[Tuple[int, float]]:
+        """Return ``(row, cosine score)`` pairs of the ``top_k`` nearest live vectors."""
+
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        self.refresh()
+
+        with self._lock:
+            matrix, alive, count = self.matrix, self.alive, len(self)
+            top_k = min(top_k, count)
+
+            if count and self._hnsw is not None:
+                self._hnsw.set_ef(max(top_k * 2, 64))
+                labels, distances = self._hnsw.knn_query(query, k=top_k)
+                return [(int(row), float(1 - distance)) for row, distance in zip(labels[0], distances[0])]
+
+        if count == 0:
+            return []
+
+        scores = matrix @ query
+        scores[~alive] = -np.inf
+
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+
+        return [(int(row), float(scores[row])) for row in best]
+
+
+class LocalVectorIndex:
+    """In-process vector index exposing the subset of the Pinecone ``Index`` API the app uses.
+
+    Uvicorn workers can share ``path``; ``.lock`` in it serialises their writes.
+    """
+
+    def __init__(self, path : Path = LOCAL_INDEX_DIR):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.path / ".lock")
+        self._namespaces : Dict[str, LocalNamespace] = {}
+
+    def _namespace(self, namespace : str, create : bool = True) -> Optional[LocalNamespace]:
+        with self._lock:
+            if namespace not in self._namespaces:
+                path = self.path / namespace
+                if not create and not path.exists():
+                    return None
+                self._namespaces[namespace] = LocalNamespace(path, self._file_lock)
+
+            return self._namespaces[namespace]
+
+    def upsert(self, vectors : List[Any], namespace : str = "", **kwargs) -> Dict[str, int]:
+        items = []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                items.append((vector["id"], vector["values"], vector.get("metadata") or {}))
+            else:
+                vector_id, values, *metadata = vector
+                items.append((vector_id, values, metadata[0] if metadata else {}))
+
+        return {"upserted_count": self._namespace(namespace).upsert(items)}
+
+    def query(self, vector : List[float], top_k : int, namespace : str = "", include_values : bool = False,
+              include_metadata : bool = False, filter : Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        if filter:
+            raise NotImplementedError("The local vector index does not support metadata filters")
+
+        store = self._namespace(namespace, create=False)
+        matches = []
+
+        for row, score in (store.query(vector, top_k) if store else []):
+            match = {"id": store.ids[row], "score": score}
+            if include_values:
+                match["values"] = store.matrix[row].tolist()
+            if include_metadata:
+                match["metadata"] = store.metadata[row]
+            matches.append(match)
+
+        return {"matches": matches, "namespace": namespace}
+
+    def fetch(self, ids : List[str], namespace : str = "", **kwargs) -> Dict[str, Any]:
+        store = self._namespace(namespace, create=False)
+        vectors = {}
+
+        if store:
+            store.refresh()
+
+        for vector_id in ids:
+            row = store.rows.get(vector_id) if store else None
+            if row is not None:
+                vectors[vector_id] = {"id": vector_id, "values": store.matrix[row].tolist(), "metadata": store.metadata[row]}
+
+        return {"vectors": vectors, "namespace": namespace}
+
+    def delete(self, ids : Optional[List[str]] = None, delete_all : bool = False, namespace : str = "", **kwargs) -> Dict:
+        if delete_all:
+            with self._lock, self._file_lock:
+                self._namespaces.pop(namespace, None)
+                shutil.rmtree(self.path / namespace, ignore_errors=True)
+        elif ids:
+            store = self._namespace(namespace, create=False)
+            if store:
+                store.delete(ids)
+
+        return {}
+
+    def list_namespaces(self) -> List[str]:
+        return sorted(path.name for path in self.path.iterdir() if path.is_dir())
+
+    def _count(self, namespace : str) -> int:
+        store = self._namespace(namespace)
+        store.refresh()
+        return len(store)
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        namespaces = {name: {"vector_count": self._count(name)} for name in self.list_namespaces()}
+        return {"namespaces": namespaces, "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values())}
+
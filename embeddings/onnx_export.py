@@ -0,0 +1,68 @@
+"""Export the embedding model to ONNX (fp32 and int8) and check parity with PyTorch.
+
+Usage:
+    python -m embeddings.onnx_export --output ./models/all-MiniLM-L6-v2
+
+Then start the API with ``EMBEDDING_MODEL_DIR`` pointing at the output
+directory and ``EMBEDDING_BACKEND=onnx`` or ``EMBEDDING_BACKEND=onnx-int8``.
+Requires ``pip install "optimum[onnxruntime]"``.
+"""
+
+from embeddings.embedding_engine import load_sentence_transformer,check_parity
+from typing import List
+import argparse
+import sys
+
+PARITY_TEXTS : List[str] = [
+    "What is the notice period mentioned in my employment contract?",
+    "Invoice #4821 was paid on 12 March 2024 by bank transfer.",
+    "The patient was advised to take 500 mg of paracetamol twice a day.",
+    "Chapter 3 describes the architecture of the retrieval pipeline.",
+    "Q3 revenue grew 14% year over year, driven by subscription sales.",
+    "Please bring your passport and two photographs to the appointment.",
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output", required=True, help="Directory to save the exported model to")
+    parser.add_argument("--quantization", default="avx512_vnni", choices=["arm64", "avx2", "avx512", "avx512_vnni"],
+                        help="Target instruction set of the int8 model")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Lowest acceptable per-text cosine vs PyTorch")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer,export_dynamic_quantized_onnx_model
+
+    reference = load_sentence_transformer(args.model, "torch")
+
+    # Loading with the ONNX backend exports the graph when the model has none
+    onnx_model = load_sentence_transformer(args.model, "onnx")
+    onnx_model.save_pretrained(args.output)
+    export_dynamic_quantized_onnx_model(onnx_model, args.quantization, args.output)
+
+    int8_file = f"onnx/model_qint8_{args.quantization}.onnx"
+    print(f"Saved {args.output}/onnx/model.onnx and {args.output}/{int8_file}")
+
+    ok = True
+
+    candidates = {
+        "onnx": load_sentence_transformer(args.model, "onnx", model_dir=args.output),
+        "onnx-int8": SentenceTransformer(args.output, device="cpu", backend="onnx", model_kwargs={"file_name": int8_file}),
+    }
+
+    for backend, candidate in candidates.items():
+        parity = check_parity(reference, candidate, PARITY_TEXTS)
+        passed = parity["min_cosine"] >= args.min_cosine
+        ok = ok and passed
+
+        print(f"{backend:10s} min cosine {parity['min_cosine']:.4f}  mean cosine {parity['mean_cosine']:.4f}  {'OK' if passed else 'FAILED'}")
+
+    if args.quantization != "avx512_vnni":
+        print(f"Set EMBEDDING_ONNX_INT8_FILE={int8_file} to use the int8 model")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,248 @@
 from langchain_core.documents import Document
 from schema.schema_models import FilePath
-from typing import List,Dict,Any
-from langchain_unstructured import UnstructuredLoader
+from typing import Iterator,Dict,Any,List,Optional,Tuple
+from embeddings.ingestion_executor import ingestion_executor
+from embeddings.loaders import FAST_LOADERS,MAX_CHARACTERS,Element
 from dotenv import load_dotenv
+from pathlib import Path
+import itertools
+import threading
+import asyncio
+import time
+import json
 import os
 
 load_dotenv()
 
-async def load_document(file_path : FilePath) -> List[Document]:
-    
-    
-    
+# PDFs with more pages than this are split into groups of this many pages and
+# parsed in parallel by the ingestion workers; 0 disables sharding
+PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", 16))
+
+
+def clean_metadata_for_pinecone(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Clean metadata to be Pinecone compatible."""
+
+    cleaned = {}
+
+    for key, value in metadata.items():
+        # Skip coordinates field entirely as it's problematic for Pinecone
+        if key == "coordinates":
+            continue
+
+        # Pinecone accepts: str, int, float, bool, list of strings
+        if isinstance(value, (str, int, float, bool, dict, list)):
+            cleaned[key] = value
+        elif value is None:
+            cleaned[key] = ""
+        else:
+            # Convert any other type to string
+            cleaned[key] = str(value)
+
+    return cleaned
+
+
+class ParseStats:
+    """Per-format parsing counters, reported under ``/metrics``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._formats : Dict[str, Dict[str, Any]] = {}
+
+    def record(self, file_format : str, parser : str, size_bytes : int, elements : int, seconds : float) -> None:
+        with self._lock:
+            entry = self._formats.setdefault(file_format, {"parser": parser, "files": 0, "elements": 0, "bytes": 0, "seconds": 0.0})
+            entry["files"] += 1
+            entry["elements"] += elements
+            entry["bytes"] += size_bytes
+            entry["seconds"] += seconds
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                file_format: {
+                    **entry,
+                    "seconds_per_file": entry["seconds"] / entry["files"],
+                    "mb_per_second": entry["bytes"] / (1024 * 1024) / entry["seconds"] if entry["seconds"] else 0.0,
+                }
+                for file_format, entry in self._formats.items()
+            }
+
+
+parse_stats = ParseStats()
+
+
+def unstructured_elements(file_path : FilePath) -> Iterator[Element]:
+    # Imported here: Unstructured is slow to import and only the worker processes need it
+    from langchain_unstructured import UnstructuredLoader
+
+    loader = UnstructuredLoader(
+        file_path=file_path,
+        mode="elements",
+        chunking_strategy="by_title",
+        max_characters=MAX_CHARACTERS
+        )
+
+    for doc in loader.lazy_load():
+        yield doc.page_content, clean_metadata_for_pinecone(doc.metadata)
+
+
+def fast_elements(file_path : FilePath) -> Iterator[Element]:
+    filetype, loader = FAST_LOADERS[Path(file_path).suffix.lower()]
+    base = {"source": str(file_path), "filename": Path(file_path).name, "filetype": filetype}
+
+    for text, metadata in loader(Path(file_path)):
+        yield text, {**base, **metadata}
+
+
+def split_pdf(file_path : FilePath, pages_per_shard : int) -> List[Tuple[Path, int]]:
+    """Write ``file_path`` out as PDFs of ``pages_per_shard`` pages.
+
+    Returns ``(shard path, pages before the shard)`` in page order, or an
+    empty list when the PDF is too short to shard or can't be split (e.g.
+    encrypted), in which case it is parsed whole.
+    """
+
+    from pypdf import PdfReader,PdfWriter
+
+    try:
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+    except Exception as e:
+        print(f"Warning: could not split {file_path}, parsing it whole: {str(e)}")
+        return []
+
+    if page_count <= pages_per_shard:
+        return []
+
+    shards = []
+
+    for first_page in range(0, page_count, pages_per_shard):
+        writer = PdfWriter()
+        for page in reader.pages[first_page:first_page + pages_per_shard]:
+            writer.add_page(page)
+
+        shard_path = Path(f"{file_path}.pages-{first_page + 1}.pdf")
+        with open(shard_path, "wb") as shard:
+            writer.write(shard)
+
+        shards.append((shard_path, first_page))
+
+    return shards
+
+
+def parse_document(file_path : FilePath, spool_path : Path, page_offset : int = 0, source : Optional[FilePath] = None) -> Tuple[int, float]:
+    """Parse a file into elements, spooled to ``spool_path`` as JSON lines.
+
+    Plain text, Markdown and CSV are read by the streaming parsers in
+    ``embeddings.loaders``; every other format goes through Unstructured,
+    inside an ingestion worker process. Elements are appended while they
+    are produced, so the whole document is never held in memory. Returns
+    the number of elements written and the parse time in seconds.
+
+    When ``file_path`` is a shard of a larger PDF, ``page_offset`` is added
+    to the page numbers and ``source`` names the original file.
+    """
+
+    start = time.perf_counter()
+    is_fast = Path(file_path).suffix.lower() in FAST_LOADERS
+    elements = fast_elements(file_path) if is_fast else unstructured_elements(file_path)
+
+    count = 0
+
+    with open(spool_path, "w", encoding="utf-8") as spool:
+        for page_content, metadata in elements:
+            if source is not None:
+                metadata.update(source=str(source), filename=Path(source).name)
+            if page_offset and isinstance(metadata.get("page_number"), int):
+                metadata["page_number"] += page_offset
+
+            spool.write(json.dumps({"page_content": page_content, "metadata": metadata}, default=str) + "\n")
+            count += 1
+
+    return count, time.perf_counter() - start
+
+
+def iter_spooled_documents(spool_path : Path) -> Iterator[Document]:
+    """Stream documents back from a spool file, deleting it once consumed."""
+
+    try:
+        with open(spool_path, encoding="utf-8") as spool:
+            for line in spool:
+                yield Document(**json.loads(line))
+
+    finally:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+
+async def load_pdf_shards(file_path : FilePath, size_bytes : int) -> Iterator[Document]:
+    """Parse a PDF as page groups across the ingestion workers and stream the elements back in page order."""
+
+    start = time.perf_counter()
+    shards = await asyncio.to_thread(split_pdf, file_path, PDF_SHARD_PAGES)
+
+    if not shards:
+        shards = [(Path(file_path), 0)]
+
+    spool_paths = [Path(f"{shard_path}.elements.jsonl") for shard_path, _ in shards]
+
     try:
-        
-        def clean_metadata_for_pinecone(metadata: Dict[str, Any]) -> Dict[str, Any]:
-            """Clean metadata to be Pinecone compatible."""
-            
-            cleaned = {}
-            
-            for key, value in metadata.items():
-                # Skip coordinates field entirely as it's problematic for Pinecone
-                if key == "coordinates":
-                    continue
-                    
-                # Pinecone accepts: str, int, float, bool, list of strings
-                if isinstance(value, (str, int, float, bool, dict, list)):
-                    cleaned[key] = value
-                elif value is None:
-                    cleaned[key] = ""
-                else:
-                    # Convert any other type to string
-                    cleaned[key] = str(value)
-            
-            return cleaned
-
-        loader = UnstructuredLoader(
-            file_path=file_path,
-            mode="elements",
-            chunking_strategy="by_title",
-            max_characters=4000
-            )
-
-        loaded = loader.lazy_load()
-        loaded_docs=[]
-        
-        for doc in loaded:
-            loaded_docs.append(doc)
-        
-        for doc in loaded_docs:
-            doc.metadata = clean_metadata_for_pinecone(doc.metadata)
-
-        return loaded_docs
+        results = await asyncio.gather(*(
+            ingestion_executor.run(parse_document, shard_path, spool_path, first_page, file_path)
+            for (shard_path, first_page), spool_path in zip(shards, spool_paths)
+        ))
+
+    except BaseException:
+        for spool_path in spool_paths:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+        raise
+
+    finally:
+        for shard_path, _ in shards:
+            if shard_path != Path(file_path) and os.path.exists(shard_path):
+                os.remove(shard_path)
+
+    count = sum(elements for elements, _ in results)
+    parse_stats.record(".pdf", "unstructured", size_bytes, count, time.perf_counter() - start)
+
+    # Each spool is deleted as soon as it has been read
+    return itertools.chain.from_iterable(iter_spooled_documents(spool_path) for spool_path in spool_paths)
+
+
+async def load_document(file_path : FilePath) -> Iterator[Document]:
+
+    spool_path = Path(f"{file_path}.elements.jsonl")
+
+    try:
+
+        suffix = Path(file_path).suffix.lower()
+        size_bytes = os.path.getsize(file_path)
+
+        if suffix in FAST_LOADERS:
+            # Cheap enough for a thread; the worker processes are kept for layout analysis and OCR
+            count, seconds = await asyncio.to_thread(parse_document, file_path, spool_path)
+            parse_stats.record(suffix, "fast", size_bytes, count, seconds)
+        elif suffix == ".pdf" and PDF_SHARD_PAGES > 0:
+            return await load_pdf_shards(file_path, size_bytes)
+        else:
+            count, seconds = await ingestion_executor.run(parse_document, file_path, spool_path)
+            parse_stats.record(suffix or "(none)", "unstructured", size_bytes, count, seconds)
+
+        return iter_spooled_documents(spool_path)
 
 
     except Exception as e:
         print(f"Error loading document {file_path}: {str(e)}")
+
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
         raise
-    
+
     finally:
-            
+
         if file_path and os.path.exists(file_path):
-            
+
             try:
                 os.remove(file_path)
             except PermissionError:
@@ -0,0 +1,190 @@
+from typing import Any,Callable,Dict,Iterator,List,Tuple
+from dotenv import load_dotenv
+import threading
+import asyncio
+import random
+import time
+import json
+import os
+
+load_dotenv()
+
+# Pinecone rejects upsert requests over 2 MB or 1000 vectors; stay under both
+UPSERT_MAX_PAYLOAD_BYTES = int(os.getenv("UPSERT_MAX_PAYLOAD_BYTES", 1_500_000))
+UPSERT_MAX_BATCH_VECTORS = int(os.getenv("UPSERT_MAX_BATCH_VECTORS", 1000))
+# Upsert requests in flight at once, across all files being ingested
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", 4))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", 5))
+UPSERT_BACKOFF_SECONDS = float(os.getenv("UPSERT_BACKOFF_SECONDS", 0.5))
+UPSERT_BACKOFF_MAX_SECONDS = 16.0
+
+# JSON size of one float in an upsert request, e.g. "-0.0123456789, "
+BYTES_PER_VALUE = 16
+REQUEST_OVERHEAD_BYTES = 64
+
+
+def estimate_size(vector : Dict[str, Any]) -> int:
+    """Rough JSON size of ``vector`` in an upsert request."""
+
+    size = REQUEST_OVERHEAD_BYTES + len(vector["id"]) + BYTES_PER_VALUE * len(vector["values"])
+    if vector.get("metadata"):
+        size += len(json.dumps(vector["metadata"], default=str))
+    return size
+
+
+def is_retryable(error : Exception) -> bool:
+    """Rate limits, server errors and connection failures are worth retrying; bad requests are not."""
+
+    if isinstance(error, (ValueError, TypeError)):
+        return False
+
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+
+class UpsertBuffer:
+    """Collects embedded micro-batches until they fill one upsert request.
+
+    Chunks are embedded a few dozen at a time, far below a request's payload
+    limit; buffering them lets each request carry as many vectors as fit.
+    """
+
+    def __init__(self, max_payload_bytes : int, max_batch_vectors : int):
+        self.max_payload_bytes = max_payload_bytes
+        self.max_batch_vectors = max_batch_vectors
+        self._clear()
+
+    def _clear(self) -> None:
+        self.vectors : List[Dict[str, Any]] = []
+        self.chunks : List[Any] = []
+        self.pulled = 0
+        self.size = 0
+
+    def fits(self, vectors : List[Dict[str, Any]]) -> bool:
+        """Whether ``vectors`` can join the buffered ones in the same request; an empty buffer takes anything."""
+
+        if not self.vectors:
+            return True
+
+        return (len(self.vectors) + len(vectors) <= self.max_batch_vectors
+                and self.size + sum(estimate_size(vector) for vector in vectors) <= self.max_payload_bytes)
+
+    def add(self, vectors : List[Dict[str, Any]], chunks : List[Any], pulled : int) -> None:
+        self.vectors.extend(vectors)
+        self.chunks.extend(chunks)
+        self.pulled += pulled
+        self.size += sum(estimate_size(vector) for vector in vectors)
+
+    def take(self) -> Tuple[List[Dict[str, Any]], List[Any], int]:
+        """Return the buffered ``(vectors, chunks, pulled)`` and empty the buffer."""
+
+        taken = (self.vectors, self.chunks, self.pulled)
+        self._clear()
+        return taken
+
+
+class UpsertWriter:
+    """Writes vectors to the index in payload-sized batches, concurrently, with retries.
+
+    Vectors are grouped so each request stays under ``max_payload_bytes``
+    and ``max_batch_vectors``. At most ``concurrency`` requests run at once
+    across every caller, each on a worker thread sharing the index client's
+    connection pool, so the event loop is never blocked. Failed requests
+    are retried with exponential backoff and jitter when the error is
+    transient. ``index_provider`` returns
+    anything with a Pinecone-style ``upsert(vectors=..., namespace=...)``,
+    e.g. a ``LocalVectorIndex`` as a stand-in for Pinecone.
+    """
+
+    def __init__(self, index_provider : Callable[[], Any], max_payload_bytes : int = UPSERT_MAX_PAYLOAD_BYTES,
+                 max_batch_vectors : int = UPSERT_MAX_BATCH_VECTORS, concurrency : int = UPSERT_CONCURRENCY,
+                 max_retries : int = UPSERT_MAX_RETRIES, backoff_seconds : float = UPSERT_BACKOFF_SECONDS):
+        self.index_provider = index_provider
+        self.max_payload_bytes = max_payload_bytes
+        self.max_batch_vectors = max(1, max_batch_vectors)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._vectors = 0
+        self._batches = 0
+        self._retries = 0
+        self._failed_batches = 0
+        self._seconds = 0.0
+
+    def buffer(self) -> UpsertBuffer:
+        return UpsertBuffer(self.max_payload_bytes, self.max_batch_vectors)
+
+    def batches(self, vectors : List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        batch, size = [], 0
+
+        for vector in vectors:
+            vector_size = estimate_size(vector)
+
+            if batch and (size + vector_size > self.max_payload_bytes or len(batch) >= self.max_batch_vectors):
+                yield batch
+                batch, size = [], 0
+
+            batch.append(vector)
+            size += vector_size
+
+        if batch:
+            yield batch
+
+    async def _send(self, batch : List[Dict[str, Any]], namespace : str) -> None:
+        """Upsert one batch, retrying transient failures."""
+
+        index = await asyncio.to_thread(self.index_provider)
+
+        async with self._slots:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await asyncio.to_thread(index.upsert, vectors=batch, namespace=namespace)
+                    return
+
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        with self._lock:
+                            self._failed_batches += 1
+                        raise
+
+                    delay = min(UPSERT_BACKOFF_MAX_SECONDS, self.backoff_seconds * 2 ** attempt)
+                    print(f"Upsert of {len(batch)} vectors to {namespace} failed ({str(e)}), retrying in {delay:.1f}s")
+
+                    with self._lock:
+                        self._retries += 1
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def upsert(self, vectors : List[Dict[str, Any]], namespace : str) -> int:
+        """Upsert ``vectors`` into ``namespace``; raises once a batch has exhausted its retries."""
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(self._send(batch, namespace)) for batch in self.batches(vectors)]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        with self._lock:
+            self._vectors += len(vectors)
+            self._batches += len(tasks)
+            self._seconds += time.perf_counter() - started
+
+        return len(vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "vectors": self._vectors,
+                "batches": self._batches,
+                "retries": self._retries,
+                "failed_batches": self._failed_batches,
+                "concurrency": self.concurrency,
+                "seconds": round(self._seconds, 3),
+                "vectors_per_second": self._vectors / self._seconds if self._seconds else 0.0,
+            }
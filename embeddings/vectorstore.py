@@ -1,49 +1,191 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
 from fastapi.responses import JSONResponse
 from fastapi import HTTPException
-from pinecone import Pinecone
 from dotenv import load_dotenv
+from langchain_core.documents import Document
 from schema.schema_models import SplitDoc
-import uuid
+from embeddings.document_registry import document_registry,chunk_hash
+from embeddings.chunk_store import chunk_store
+from embeddings.bm25_index import bm25_index
+from embeddings.embedding_cache import CachedEmbeddings
+from embeddings.embedding_engine import EmbeddingEngine
+from embeddings.chunking import TokenChunker
+from embeddings.lazy import LazyResource
+from embeddings.upsert_writer import UpsertWriter
+from embeddings.local_index import LocalVectorIndex
+from typing import AbstractSet,Any,Callable,Dict,List,Optional,Tuple
+from itertools import islice
+import asyncio
 import os
 
 load_dotenv()
 
-def namespace_creation():
-    return str(uuid.uuid4())
-
-unique_namespace=namespace_creation()
+# "pinecone" or "local" (in-process index persisted under LOCAL_INDEX_DIR)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
 
+if VECTOR_STORE_BACKEND not in ("pinecone", "local"):
+    raise ValueError(f"Unknown vector store backend {VECTOR_STORE_BACKEND!r}, expected 'pinecone' or 'local'")
 
 index_name='pinecone-database-index'
-pc=Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index=pc.Index(index_name)
 
-splitter=RecursiveCharacterTextSplitter(chunk_size=1000,chunk_overlap=200)
 
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+def create_index():
+    if VECTOR_STORE_BACKEND == "local":
+        return LocalVectorIndex()
 
-def get_vectorstore(namespace : str):
-    
-    return PineconeVectorStore(
-            embedding=embedding_model,
-            index=index,
-            namespace=namespace
-        )
+    from pinecone import Pinecone
+
+    pc=Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index=pc.Index(index_name)
+
+    # One round trip, so a bad key or a missing index shows up as not ready
+    index.describe_index_stats()
+
+    return index
+
+
+# Created on first use (or by the warm-up in main.py), so importing this module stays fast
+vector_index = LazyResource("vector_index", create_index)
+
+
+def get_index():
+    return vector_index.get()
+
+
+# Shared by every ingestion job, so UPSERT_CONCURRENCY bounds the requests to the index overall
+upsert_writer = UpsertWriter(get_index)
+
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+embedding_engine = EmbeddingEngine(EMBEDDING_MODEL_NAME)
+
+# Chunk size in tokens; 0 uses the embedding model's window (256 for MiniLM) minus [CLS]/[SEP]
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+
+chunker = LazyResource("chunker", lambda: TokenChunker(
+    embedding_engine.model.tokenizer,
+    CHUNK_MAX_TOKENS or embedding_engine.model.max_seq_length - 2,
+    CHUNK_OVERLAP_TOKENS
+))
+
+# Shared by ingestion and retrieval, so repeated chunks and queries hit the cache.
+# Keyed by backend too, since ONNX/int8 vectors differ slightly from PyTorch ones.
+embedding_model = CachedEmbeddings(embedding_engine, f"{EMBEDDING_MODEL_NAME}@{embedding_engine.backend}")
+
+# Chunks embedded per micro-batch, and full upsert requests allowed to wait on the writer
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))
+UPSERT_MAX_IN_FLIGHT = int(os.getenv("UPSERT_MAX_IN_FLIGHT", 4))
+
+
+def embed_next_batch(docs, batch_size : int, namespace : str, queued : AbstractSet[str] = frozenset()) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str, Dict[str, Any]]], int]:
+    """Pull up to ``batch_size`` documents from ``docs`` and turn the new ones into Pinecone vectors.
+
+    Chunks whose hash is already registered in ``namespace``, or in
+    ``queued`` (embedded earlier but not registered yet), are not embedded
+    again. Returns the vectors, the ``(id, text, metadata)`` chunks for the
+    chunk store and the number of documents pulled.
+    """
+
+    batch : List[Document] = list(islice(docs, batch_size))
+
+    # Keep the first occurrence of every chunk text, keyed by its hash
+    by_hash = {}
+    for doc in batch:
+        by_hash.setdefault(chunk_hash(doc.page_content), doc)
+
+    known = document_registry.known_chunks(namespace, list(by_hash))
+    new_docs = {h: doc for h, doc in by_hash.items() if h not in known and h not in queued}
 
+    if not new_docs:
+        return [], [], len(batch)
 
-async def split_store_documents(loaded_docs : SplitDoc) :
+    embeddings = embedding_model.embed_documents([doc.page_content for doc in new_docs.values()])
+
+    # Text and metadata go to the chunk store, so the index only holds vectors.
+    # The chunk hash doubles as a deterministic id, which makes re-upserts idempotent.
+    vectors = [{"id": h, "values": values} for h, values in zip(new_docs, embeddings)]
+    chunks = [(h, doc.page_content, doc.metadata) for h, doc in new_docs.items()]
+
+    return vectors, chunks, len(batch)
+
+
+async def split_store_documents(loaded_docs : SplitDoc, namespace : str, on_batch_stored : Optional[Callable[[int, int], None]] = None) :
+    """Embed documents in micro-batches and upsert them in full requests.
+
+    ``loaded_docs`` may be any iterable, including a generator streaming
+    from disk. Embedded micro-batches are buffered until they fill one
+    upsert request (``UPSERT_MAX_PAYLOAD_BYTES`` / ``UPSERT_MAX_BATCH_VECTORS``).
+    At most ``UPSERT_MAX_IN_FLIGHT`` full requests wait for the upsert
+    writer at a time, so memory stays bounded whatever the document size.
+    ``on_batch_stored(stored, skipped)`` is called as batches complete.
+    """
+
+    in_flight = asyncio.Semaphore(UPSERT_MAX_IN_FLIGHT)
+    pending = set()
+    buffer = upsert_writer.buffer()
+    # Hashes buffered or being upserted, which the registry doesn't know yet
+    queued = set()
+
+    async def upsert(vectors, chunks, pulled):
+        try:
+            # Text first, so a search never returns an id the chunk store doesn't know
+            await asyncio.to_thread(chunk_store.put_many, namespace, chunks)
+            await asyncio.to_thread(bm25_index.add, namespace, [(chunk_id, text) for chunk_id, text, _ in chunks])
+            await upsert_writer.upsert(vectors, namespace)
+            await asyncio.to_thread(document_registry.add_chunks, namespace, [vector["id"] for vector in vectors])
+            queued.difference_update(vector["id"] for vector in vectors)
+
+            if on_batch_stored:
+                on_batch_stored(len(vectors), pulled - len(vectors))
+
+        finally:
+            in_flight.release()
+
+    async def flush():
+        vectors, chunks, pulled = buffer.take()
+        if not vectors:
+            return
+
+        await in_flight.acquire()
+        pending.add(asyncio.create_task(upsert(vectors, chunks, pulled)))
+
+        # Stop reading the document as soon as an upsert fails
+        for task in [task for task in pending if task.done()]:
+            pending.discard(task)
+            task.result()
 
     try:
-        vectorstore = get_vectorstore(unique_namespace)
-        
-        vectorstore.add_documents(loaded_docs, show_progress=True)
+        docs = iter(loaded_docs)
+
+        while True:
+            vectors, chunks, pulled = await asyncio.to_thread(embed_next_batch, docs, INGEST_BATCH_SIZE, namespace, queued)
+
+            if not pulled:
+                break
+
+            if not vectors:
+                if on_batch_stored:
+                    on_batch_stored(0, pulled)
+                continue
+
+            if not buffer.fits(vectors):
+                await flush()
+            buffer.add(vectors, chunks, pulled)
+            queued.update(vector["id"] for vector in vectors)
+
+        await flush()
+        await asyncio.gather(*pending)
+
+        # One postings row per term keeps lexical search fast as the namespace grows
+        await asyncio.to_thread(bm25_index.compact, namespace)
         
         return JSONResponse(status_code=200, content={"message": "Documents processed and stored successfully."})
     
     except Exception as e:
+        for task in pending:
+            task.cancel()
+
         # Log the error for debugging
         print(f"Error storing documents in Pinecone: {str(e)}")
         
@@ -54,9 +196,18 @@ async def split_store_documents(loaded_docs : SplitDoc) :
         )
         
         
-async def namespace_deletion():
-    namespaces = index.list_namespaces()
-    if unique_namespace in namespaces:
-        await index.delete(delete_all=True, namespace=unique_namespace)
-    else:
-        print(f"Namespace {unique_namespace} doesn't exist, skipping")
+async def namespace_deletion(namespace : str):
+    """Delete everything stored for ``namespace``; safe to repeat if it fails part way."""
+
+    await asyncio.to_thread(document_registry.forget_namespace, namespace)
+    await asyncio.to_thread(chunk_store.forget_namespace, namespace)
+    await asyncio.to_thread(bm25_index.forget_namespace, namespace)
+
+    index = await asyncio.to_thread(get_index)
+
+    try:
+        await asyncio.to_thread(index.delete, delete_all=True, namespace=namespace)
+    except Exception as e:
+        # Pinecone answers 404 for a namespace that holds no vectors
+        if getattr(e, "status", None) != 404:
+            raise
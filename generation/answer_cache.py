@@ -0,0 +1,132 @@
+from langchain_core.embeddings import Embeddings
+from embeddings.document_registry import document_registry
+from embeddings.vectorstore import embedding_model
+from collections import OrderedDict
+from typing import Any,Callable,Dict,List,Optional,Tuple
+from dotenv import load_dotenv
+import numpy as np
+import threading
+import itertools
+import hashlib
+import time
+import os
+
+load_dotenv()
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 2048))  # 0 disables the cache
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+# Cosine similarity above which two questions are treated as the same question
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+
+# (scope, normalised query vector)
+CacheKey = Tuple[str, np.ndarray]
+
+
+class AnswerCache:
+    """Answers to earlier questions, reused for repeated and near-duplicate ones.
+
+    Entries are grouped by scope: a digest of the chunks stored in the
+    session's namespace and of the conversation so far. Sessions that
+    uploaded the same documents share answers to their opening questions,
+    a follow-up only matches one asked after the same conversation, and an
+    answer never outlives the documents it was generated from. Within a
+    scope a question matches an earlier one if their query embeddings have
+    a cosine similarity of at least ``threshold``. Entries expire after
+    ``ttl_seconds`` and the least recently used ones are evicted beyond
+    ``max_entries``.
+    """
+
+    def __init__(self, embedding : Embeddings, content_digest : Callable[[str], str], max_entries : int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds : int = ANSWER_CACHE_TTL_SECONDS, threshold : float = ANSWER_CACHE_THRESHOLD):
+        self.embedding = embedding
+        self.content_digest = content_digest
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # entry id -> (scope, query vector, answer, created_at), least recently used first
+        self._entries : "OrderedDict[int, Tuple[str, np.ndarray, str, float]]" = OrderedDict()
+        # scope -> ids of its entries
+        self._scopes : Dict[str, List[int]] = {}
+
+    def _remove(self, entry_id : int) -> None:
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._scopes[scope]
+
+        ids.remove(entry_id)
+        if not ids:
+            del self._scopes[scope]
+
+    def scope(self, namespace : str, conversation : str) -> str:
+        digest = hashlib.sha256(self.content_digest(namespace).encode("utf-8"))
+        digest.update(conversation.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, query : str, namespace : str, conversation : str = "") -> Tuple[Optional[str], Optional[CacheKey]]:
+        """Return a cached answer (or ``None``) and the key to ``store`` a fresh answer under.
+
+        ``conversation`` is the chat history before ``query``. Blocking: embeds
+        the query and reads the registry, so call it off the event loop.
+        """
+
+        if self.max_entries <= 0:
+            return None, None
+
+        vector = np.asarray(self.embedding.embed_query(query), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        key = (self.scope(namespace, conversation), vector)
+        now = time.time()
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+
+            for entry_id in list(self._scopes.get(key[0], [])):
+                _, cached_vector, _, created_at = self._entries[entry_id]
+
+                if now - created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+
+                score = float(cached_vector @ vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None, key
+
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][2], key
+
+    def store(self, key : Optional[CacheKey], answer : str) -> None:
+        if key is None or not answer:
+            return
+
+        scope, vector = key
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._scopes.setdefault(scope, []).append(entry_id)
+            self._entries[entry_id] = (scope, vector, answer, time.time())
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+answer_cache = AnswerCache(embedding_model, document_registry.content_digest)
@@ -0,0 +1,161 @@
+from langchain_core.runnables import Runnable,RunnableLambda
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from generation.retrieval import hybrid_search
+from generation.context_packing import context_packer
+from embeddings.lazy import LazyResource
+from collections import OrderedDict
+from dotenv import load_dotenv
+import threading
+import os
+
+load_dotenv()
+
+LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct")
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", 7))
+RETRIEVER_LAMBDA_MULT = float(os.getenv("RETRIEVER_LAMBDA_MULT", 0.4))
+# Candidates fetched (with their vectors) for MMR re-ranking
+RETRIEVER_FETCH_K = int(os.getenv("RETRIEVER_FETCH_K", 50))
+# BM25 hits fused with the dense results; 0 turns retrieval back to dense only
+RETRIEVER_LEXICAL_K = int(os.getenv("RETRIEVER_LEXICAL_K", 20))
+MAX_CACHED_NAMESPACES = int(os.getenv("MAX_CACHED_NAMESPACES", 256))
+
+final_template = PromptTemplate(
+    template="""
+    You are a reliable and precise AI assistant.
+
+    ### CRITICAL RULES (Must Follow Strictly)
+    - Use **ONLY** the information provided in the Context section.
+    - Do **NOT** use prior knowledge or assumptions.
+    - Do **NOT** make up or infer missing details.
+    - If the answer is not clearly present in the context, say:
+    **"I cannot find the answer in the provided context."**
+
+    ### TASK
+    - First understand the user query and respond to it like a human with the relevant data.
+    - Answer the user's question accurately using only the provided context.
+    - If the context partially answers the question, clearly state what is available and what is missing.
+    - If the question is unclear, ask a clarification question **without adding new information**.
+
+    ### CONTEXT
+    {context}
+
+    ### CHAT HISTORY (For reference only, do not add new facts)
+    {chat_history}
+
+    ### RESPONSE GUIDELINES
+    - **Maintain a helpful and conversational tone** while staying factual.
+    - Be concise, clear, and factual.
+    - Do not repeat the context verbatim unless necessary.
+    - If relevant, summarize the information in simple terms.
+
+    ### FINAL ANSWER
+    """,
+        input_variables=["context", "chat_history"]
+    )
+
+summary_template = PromptTemplate(
+    template="""
+    You maintain a running summary of a conversation between a user and an AI assistant
+    that answers questions about the user's documents.
+
+    ### CURRENT SUMMARY
+    {summary}
+
+    ### NEW TURNS
+    {turns}
+
+    ### TASK
+    - Rewrite the summary so it also covers the new turns.
+    - Keep names, numbers, dates and open questions; drop pleasantries.
+    - Use at most {max_words} words and do not add facts that are not in the turns.
+
+    ### UPDATED SUMMARY
+    """,
+        input_variables=["summary", "turns", "max_words"]
+    )
+
+
+class RagChainFactory:
+    """Builds the RAG runnables once and hands out the cached instances.
+
+    The LLM chain is shared by every request, so the underlying inference
+    client and its pooled HTTP connections are reused instead of being
+    re-created (with a fresh TLS handshake) per chat call. Context chains
+    are cached per namespace, keeping the most recently used ones.
+    """
+
+    def __init__(self, llm_model : str, max_namespaces : int = MAX_CACHED_NAMESPACES):
+        self.llm_model = llm_model
+        self.max_namespaces = max_namespaces
+        self._lock = threading.Lock()
+        self._llm = None
+        self.model = LazyResource("llm", self._create_model)
+        self._final_chain = None
+        self._summary_chain = None
+        self._context_chains : "OrderedDict[str, Runnable]" = OrderedDict()
+
+    def _create_model(self):
+        from langchain_huggingface import HuggingFaceEndpoint,ChatHuggingFace
+
+        self._llm = HuggingFaceEndpoint(
+            model=self.llm_model,
+            task="text-generation"
+        )
+        return ChatHuggingFace(llm=self._llm)
+
+    def _get_model(self):
+        return self.model.get()
+
+    def get_final_chain(self) -> Runnable:
+        with self._lock:
+            if self._final_chain is None:
+                self._final_chain = final_template | self._get_model() | StrOutputParser()
+
+            return self._final_chain
+
+    def get_summary_chain(self) -> Runnable:
+        with self._lock:
+            if self._summary_chain is None:
+                self._summary_chain = summary_template | self._get_model() | StrOutputParser()
+
+            return self._summary_chain
+
+    def get_context_chain(self, namespace : str) -> Runnable:
+        with self._lock:
+            if namespace in self._context_chains:
+                self._context_chains.move_to_end(namespace)
+                return self._context_chains[namespace]
+
+            retriever = RunnableLambda(
+                lambda query: hybrid_search(query, namespace, RETRIEVER_K, RETRIEVER_FETCH_K, RETRIEVER_LAMBDA_MULT, RETRIEVER_LEXICAL_K)
+            )
+            context_chain = retriever | RunnableLambda(context_packer.pack)
+
+            self._context_chains[namespace] = context_chain
+            if len(self._context_chains) > self.max_namespaces:
+                self._context_chains.popitem(last=False)
+
+            return context_chain
+
+    def forget_namespace(self, namespace : str) -> None:
+        with self._lock:
+            self._context_chains.pop(namespace, None)
+
+    async def aclose(self) -> None:
+        """Close the inference clients' HTTP sessions."""
+
+        if self._llm is None:
+            return
+
+        for client in (getattr(self._llm, "async_client", None), getattr(self._llm, "client", None)):
+            close = getattr(client, "aclose", None) or getattr(client, "close", None)
+            if close is None:
+                continue
+
+            result = close()
+            if hasattr(result, "__await__"):
+                await result
+
+
+rag_chains = RagChainFactory(LLM_MODEL)
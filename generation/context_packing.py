@@ -0,0 +1,96 @@
+from langchain_core.documents import Document
+from generation.token_counter import TokenCounter,token_counter
+from typing import Iterable,List,Set
+from dotenv import load_dotenv
+import re
+import os
+
+load_dotenv()
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+# Share of a passage's word 5-grams already in the context above which it is dropped as a near-duplicate
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.8))
+
+SHINGLE_SIZE = 5
+# Sentences shorter than this (in words) are never dropped as repeats, e.g. table headers
+MIN_SENTENCE_WORDS = 5
+# A passage cut to fit the budget must keep at least this many tokens to be worth including
+MIN_PARTIAL_TOKENS = 64
+SEPARATOR = "\n\n"
+
+WORD = re.compile(r"\w+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _shingles(words : List[str]) -> Set[int]:
+    if len(words) < SHINGLE_SIZE:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + SHINGLE_SIZE])) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+class ContextPacker:
+    """Assembles retrieved chunks into a prompt context that fits a token budget.
+
+    Chunks arrive most relevant first and keep that order. A chunk whose word
+    5-grams are mostly in the context already is skipped as a near-duplicate,
+    and sentences already included are removed from the rest, which strips
+    the overlap between neighbouring chunk windows. Chunks are added until
+    ``token_budget`` (counted with the LLM's tokenizer) is spent; the one that
+    crosses it is trimmed to fit.
+    """
+
+    def __init__(self, counter : TokenCounter, token_budget : int = CONTEXT_TOKEN_BUDGET,
+                 duplicate_threshold : float = CONTEXT_DUPLICATE_THRESHOLD):
+        self.counter = counter
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+
+    def pack(self, docs : Iterable[Document]) -> str:
+        seen_shingles : Set[int] = set()
+        seen_sentences : Set[str] = set()
+        separator_tokens = self.counter.count(SEPARATOR)
+        parts = []
+        used = 0
+
+        for doc in docs:
+            shingles = _shingles(WORD.findall(doc.page_content.lower()))
+            if not shingles or len(shingles & seen_shingles) / len(shingles) >= self.duplicate_threshold:
+                continue
+
+            lines = []
+            for line in doc.page_content.splitlines():
+                sentences = []
+                for sentence in SENTENCE_END.split(line.strip()):
+                    words = WORD.findall(sentence.lower())
+                    key = " ".join(words)
+
+                    if len(words) >= MIN_SENTENCE_WORDS:
+                        if key in seen_sentences:
+                            continue
+                        seen_sentences.add(key)
+
+                    sentences.append(sentence)
+
+                if sentences:
+                    lines.append(" ".join(sentences))
+
+            text = "\n".join(lines).strip()
+            if not text:
+                continue
+
+            cost = self.counter.count(text) + (separator_tokens if parts else 0)
+
+            if used + cost > self.token_budget:
+                remaining = self.token_budget - used - (separator_tokens if parts else 0)
+                if remaining >= MIN_PARTIAL_TOKENS:
+                    parts.append(self.counter.trim(text, remaining))
+                break
+
+            parts.append(text)
+            seen_shingles |= shingles
+            used += cost
+
+        return SEPARATOR.join(parts)
+
+
+context_packer = ContextPacker(token_counter)
@@ -0,0 +1,90 @@
+from langchain_core.messages import BaseMessage,HumanMessage
+from generation.token_counter import TokenCounter,token_counter
+from schema.schema_models import ChatSession
+from typing import Awaitable,Callable,List
+from dotenv import load_dotenv
+import asyncio
+import os
+
+load_dotenv()
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1024))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", 256))
+
+# After a compaction the verbatim turns use at most this share of their budget,
+# so the summary is refreshed every few turns rather than on every turn.
+COMPACTION_TARGET = 0.6
+
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+
+def format_message(message : BaseMessage) -> str:
+    role = "User" if isinstance(message, HumanMessage) else "Assistant"
+    return f"{role}: {message.content}"
+
+
+class HistoryManager:
+    """Keeps the chat history part of the prompt within a token budget.
+
+    The most recent turns are included verbatim. Older turns are folded into
+    a running summary that is stored on the session, so each turn is only
+    summarised once and the prompt size stays bounded however long the
+    conversation gets.
+    """
+
+    def __init__(self, counter : TokenCounter, token_budget : int = HISTORY_TOKEN_BUDGET,
+                 summary_tokens : int = HISTORY_SUMMARY_TOKENS):
+        self.counter = counter
+        self.token_budget = token_budget
+        self.summary_tokens = min(summary_tokens, token_budget)
+
+    def _recent_start(self, messages : List[BaseMessage], start : int, budget : int) -> int:
+        """Index of the oldest message from ``start`` on whose tail fits in ``budget`` tokens."""
+
+        used = 0
+        index = len(messages)
+
+        while index > start:
+            cost = self.counter.count(format_message(messages[index - 1]))
+
+            # The latest message is always kept, even if it alone exceeds the budget
+            if used + cost > budget and index < len(messages):
+                break
+
+            used += cost
+            index -= 1
+
+        return index
+
+    async def build(self, session : ChatSession, summarize : Summarizer) -> str:
+        """Return the formatted history for the prompt, compacting the session if needed.
+
+        Token counting encodes with the tokenizer (and may load it), so it runs in a thread.
+        """
+
+        messages = session.chat_history
+        recent_budget = self.token_budget - self.summary_tokens
+
+        start = await asyncio.to_thread(self._recent_start, messages, session.summarized_upto, recent_budget)
+
+        if start > session.summarized_upto:
+            # Over budget: fold the oldest verbatim turns into the summary, leaving some slack
+            slack_start = await asyncio.to_thread(
+                self._recent_start, messages, session.summarized_upto, int(recent_budget * COMPACTION_TARGET)
+            )
+            start = max(start, slack_start)
+            folded = "\n".join(format_message(message) for message in messages[session.summarized_upto:start])
+
+            summary = await summarize(session.history_summary, folded)
+            session.history_summary = await asyncio.to_thread(self.counter.trim, summary.strip(), self.summary_tokens)
+            session.summarized_upto = start
+
+        recent = "\n".join(format_message(message) for message in messages[session.summarized_upto:])
+
+        if session.history_summary:
+            return f"Summary of the earlier conversation: {session.history_summary}\n\n{recent}"
+
+        return recent
+
+
+history_manager = HistoryManager(token_counter)
@@ -0,0 +1,42 @@
+from typing import List
+import numpy as np
+
+
+def mmr_select(query_vector : np.ndarray, candidates : np.ndarray, k : int, lambda_mult : float) -> List[int]:
+    """Pick ``k`` rows of ``candidates`` by maximal marginal relevance.
+
+    Every step scores all remaining candidates at once: relevance to the
+    query minus their highest similarity to anything already picked. That
+    running maximum is updated with one matrix-vector product per pick, so
+    the cost is ``O(k * fetch_k * dim)`` in NumPy instead of a Python loop
+    over candidates.
+    """
+
+    if len(candidates) == 0 or k <= 0:
+        return []
+
+    candidates = np.asarray(candidates, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+
+    similarity = candidates @ query_vector
+    relevance = lambda_mult * similarity
+    # -inf rather than 0, so a candidate dissimilar to every pick keeps its negative similarity
+    max_similarity = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected = []
+
+    for _ in range(min(k, len(candidates))):
+        # The first pick has no redundancy term, so it is simply the most similar candidate,
+        # taken from the raw similarity: scaled by lambda_mult = 0 every score would tie
+        scores = relevance - (1 - lambda_mult) * max_similarity if selected else similarity.copy()
+        scores[~available] = -np.inf
+
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+
+        np.maximum(max_similarity, candidates @ candidates[best], out=max_similarity)
+
+    return selected
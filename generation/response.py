@@ -1,76 +1,107 @@
-from langchain_core.runnables import RunnableParallel,RunnablePassthrough,RunnableLambda
-from langchain_huggingface import HuggingFaceEndpoint,ChatHuggingFace
-from langchain_core.output_parsers import StrOutputParser
-from langchain_pinecone import PineconeVectorStore
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage
-from langchain_core.documents import Document
-from typing import List,Tuple,Dict
-from schema.schema_models import ChatHist,ChatRequest
-from embeddings.vectorstore import get_vectorstore,unique_namespace
-
-async def response_generation(query : ChatRequest,chat_history : ChatHist) -> str:
-    
-    vectorstore = get_vectorstore(unique_namespace)
-        
-    retriever=vectorstore.as_retriever(
-    search_type="mmr",
-    search_kwargs={"k":7,"lambda_mult":0.4}
-    )
-
-    context_chain = retriever | RunnableLambda(lambda docs: "\n\n".join(doc.page_content for doc in docs))
-    
-    context = context_chain.invoke(query)
-
-    final_template = PromptTemplate(
-    template="""
-    You are a reliable and precise AI assistant.
-
-    ### CRITICAL RULES (Must Follow Strictly)
-    - Use **ONLY** the information provided in the Context section.
-    - Do **NOT** use prior knowledge or assumptions.
-    - Do **NOT** make up or infer missing details.
-    - If the answer is not clearly present in the context, say:
-    **"I cannot find the answer in the provided context."**
-
-    ### TASK
-    - First understand the user query and respond to it like a human with the relevant data.
-    - Answer the user's question accurately using only the provided context.
-    - If the context partially answers the question, clearly state what is available and what is missing.
-    - If the question is unclear, ask a clarification question **without adding new information**.
-
-    ### CONTEXT
-    {context}
-
-    ### CHAT HISTORY (For reference only, do not add new facts)
-    {chat_history}
-
-    ### RESPONSE GUIDELINES
-    - **Maintain a helpful and conversational tone** while staying factual.
-    - Be concise, clear, and factual.
-    - Do not repeat the context verbatim unless necessary.
-    - If relevant, summarize the information in simple terms.
-
-    ### FINAL ANSWER
-    """,
-        input_variables=["context", "chat_history"]
-    )
-
-    
-    llm=HuggingFaceEndpoint(
-        model="meta-llama/Llama-3.1-8B-Instruct",
-        task="text-generation"
-    )
-    
-    model=ChatHuggingFace(llm=llm)
-    
-    parser=StrOutputParser()
-    
-    final_chain = final_template | model | parser
-    
-    response= await final_chain.ainvoke({"context":context,"chat_history":chat_history})
-    
+from schema.schema_models import ChatRequest,ChatSession
+from generation.chain_factory import rag_chains
+from generation.history import history_manager,format_message,HISTORY_SUMMARY_TOKENS
+from generation.answer_cache import answer_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any,AsyncIterator,Dict,Tuple
+from dotenv import load_dotenv
+import asyncio
+import os
+
+load_dotenv()
+
+# Query embedding and the Pinecone MMR search are blocking; run them here, not on the event loop
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", 8))
+retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+
+async def retrieve_context(query : str, namespace : str) -> str:
+    loop = asyncio.get_running_loop()
+    context_chain = rag_chains.get_context_chain(namespace)
+
+    return await loop.run_in_executor(retrieval_pool, context_chain.invoke, query)
+
+
+async def summarize_history(summary : str, turns : str) -> str:
+    """Fold ``turns`` into the running ``summary`` with the LLM."""
+
+    summary_chain = rag_chains.get_summary_chain()
+
+    try:
+        return await summary_chain.ainvoke({
+            "summary": summary or "(empty)",
+            "turns": turns,
+            "max_words": int(HISTORY_SUMMARY_TOKENS * 0.75)
+        })
+
+    except Exception as e:
+        # Keep answering: the old turns are dropped instead of summarised
+        print(f"Error summarizing chat history: {str(e)}")
+        return summary
+
+
+async def prepare_inputs(query : ChatRequest,session : ChatSession) -> Dict[str, str]:
+    """Retrieve the context and compact the chat history concurrently."""
+
+    context_task = asyncio.create_task(retrieve_context(query, session.namespace))
+
+    try:
+        chat_history = await history_manager.build(session, summarize_history)
+    except BaseException:
+        context_task.cancel()
+        raise
+
+    return {"context": await context_task, "chat_history": chat_history}
+
+
+async def lookup_answer(query : str, session : ChatSession):
+    """Cached answer (or ``None``) and store key for ``query`` after the session's conversation so far."""
+
+    # chat_history already ends with the current question. The earlier turns determine the
+    # history summary too, so it is left out: it is generated, and differs from run to run.
+    conversation = "\n".join(format_message(message) for message in session.chat_history[:-1])
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(retrieval_pool, answer_cache.lookup, query, session.namespace, conversation)
+
+
+async def response_generation(query : ChatRequest,session : ChatSession) -> str:
+
+    cached, cache_key = await lookup_answer(query, session)
+    if cached is not None:
+        return cached
+
+    inputs = await prepare_inputs(query, session)
+
+    final_chain = rag_chains.get_final_chain()
+
+    response= await final_chain.ainvoke(inputs)
+
+    answer_cache.store(cache_key, response)
+
     return response
 
 
-chat_history : ChatHist =[]
\ No newline at end of file
+async def stream_response_generation(query : ChatRequest,session : ChatSession) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(event, data)`` pairs: one ``context`` event once retrieval is done, then ``token`` events."""
+
+    cached, cache_key = await lookup_answer(query, session)
+    if cached is not None:
+        yield "context", {"chars": 0, "cached": True}
+        yield "token", {"text": cached}
+        return
+
+    inputs = await prepare_inputs(query, session)
+
+    yield "context", {"chars": len(inputs["context"])}
+
+    final_chain = rag_chains.get_final_chain()
+    tokens = []
+
+    async for token in final_chain.astream(inputs):
+        if token:
+            tokens.append(token)
+            yield "token", {"text": token}
+
+    # Only reached when the whole answer was streamed
+    answer_cache.store(cache_key, "".join(tokens))
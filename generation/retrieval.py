@@ -0,0 +1,94 @@
+from langchain_core.documents import Document
+from embeddings.vectorstore import get_index,embedding_model
+from embeddings.chunk_store import chunk_store,Chunk
+from embeddings.bm25_index import bm25_index
+from generation.mmr import mmr_select
+from typing import Any,Dict,List,Sequence
+import numpy as np
+
+# Metadata key that held the chunk text before it moved to the chunk store
+TEXT_KEY = "text"
+
+# Damping constant of reciprocal rank fusion; 60 is the value from the original paper
+RRF_K = 60
+
+
+def _field(obj : Any, name : str) -> Any:
+    # Pinecone returns response objects, the local index plain dicts
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+
+def hydrate(namespace : str, ids : List[str]) -> Dict[str, Chunk]:
+    """Look up the text and metadata of ``ids`` in the chunk store.
+
+    Vectors stored before the chunk store existed carry their text in the
+    index metadata, so ids the store doesn't know are fetched from the index.
+    """
+
+    chunks = chunk_store.get_many(namespace, ids)
+    missing = [chunk_id for chunk_id in ids if chunk_id not in chunks]
+
+    if missing:
+        vectors = _field(get_index().fetch(ids=missing, namespace=namespace), "vectors")
+
+        for chunk_id, vector in vectors.items():
+            metadata = dict(_field(vector, "metadata") or {})
+            chunks[chunk_id] = (metadata.pop(TEXT_KEY, ""), metadata)
+
+    return chunks
+
+
+def reciprocal_rank_fusion(rankings : Sequence[Sequence[str]], k : int = RRF_K) -> List[str]:
+    """Merge ranked id lists, scoring each id by the sum of ``1 / (k + rank)`` over the lists it appears in."""
+
+    scores : Dict[str, float] = {}
+
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def mmr_ids(query : str, namespace : str, k : int, fetch_k : int, lambda_mult : float) -> List[str]:
+    """Fetch ``fetch_k`` candidates with their vectors in one query and pick ``k`` ids with ``mmr_select``."""
+
+    query_vector = embedding_model.embed_query(query)
+
+    result = get_index().query(
+        vector=query_vector,
+        top_k=max(fetch_k, k),
+        namespace=namespace,
+        include_values=True
+    )
+    matches : List[Dict[str, Any]] = result["matches"]
+
+    if not matches:
+        return []
+
+    candidates = np.asarray([match["values"] for match in matches], dtype=np.float32)
+    selected = mmr_select(np.asarray(query_vector, dtype=np.float32), candidates, k, lambda_mult)
+
+    return [matches[i]["id"] for i in selected]
+
+
+def hybrid_search(query : str, namespace : str, k : int, fetch_k : int, lambda_mult : float, lexical_k : int) -> List[Document]:
+    """Dense MMR results fused with the top ``lexical_k`` BM25 hits, best ``k`` first.
+
+    BM25 catches exact identifiers, names and numbers that MiniLM embeddings
+    blur. The index returns only ids and vectors; the text of the selected
+    chunks is read from the chunk store.
+    """
+
+    ids = mmr_ids(query, namespace, k, fetch_k, lambda_mult)
+
+    if lexical_k > 0:
+        lexical = [chunk_id for chunk_id, _ in bm25_index.search(namespace, query, lexical_k)]
+        ids = reciprocal_rank_fusion([ids, lexical])[:k]
+
+    chunks = hydrate(namespace, ids)
+
+    return [
+        Document(id=chunk_id, page_content=chunks[chunk_id][0], metadata=chunks[chunk_id][1])
+        for chunk_id in ids if chunk_id in chunks
+    ]
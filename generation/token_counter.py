@@ -0,0 +1,80 @@
+from embeddings.lazy import LazyResource
+from functools import lru_cache
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Tokenizer used to measure prompt parts; defaults to the generation model's own
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct"))
+
+# Rough characters per token, used when the tokenizer cannot be loaded
+CHARS_PER_TOKEN = 4
+# Seconds before a tokenizer that failed to load is tried again
+TOKENIZER_RETRY_SECONDS = 300
+
+
+class TokenCounter:
+    """Counts and trims text in tokens of the LLM's tokenizer.
+
+    The tokenizer is loaded by the warm-up or on first use; counting may
+    download it, so call this off the event loop. If it is unavailable (e.g.
+    a gated model without a HuggingFace token) counts fall back to a
+    characters-per-token estimate, ``/health`` reports the load error and
+    the load is retried every ``TOKENIZER_RETRY_SECONDS``.
+    """
+
+    def __init__(self, tokenizer_name : str):
+        self.tokenizer_name = tokenizer_name
+        self.tokenizer = LazyResource("prompt_tokenizer", self._load, retry_seconds=TOKENIZER_RETRY_SECONDS)
+        self.count = lru_cache(maxsize=4096)(self._count)
+        self._estimating = False
+
+    def _load(self):
+        try:
+            from transformers import AutoTokenizer
+            return AutoTokenizer.from_pretrained(self.tokenizer_name)
+        except Exception as e:
+            print(f"Warning: could not load tokenizer {self.tokenizer_name}, estimating token counts: {str(e)}")
+            raise
+
+    def _tokenizer(self):
+        """The tokenizer, or None while it can't be loaded."""
+
+        try:
+            tokenizer = self.tokenizer.get()
+        except Exception:
+            self._estimating = True
+            return None
+
+        if self._estimating:
+            # Counts cached while estimating would disagree with the tokenizer's
+            self._estimating = False
+            self.count.cache_clear()
+
+        return tokenizer
+
+    def _count(self, text : str) -> int:
+        tokenizer = self._tokenizer()
+
+        if tokenizer is None:
+            return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def trim(self, text : str, max_tokens : int) -> str:
+        """Cut ``text`` down to at most ``max_tokens`` tokens."""
+
+        if self.count(text) <= max_tokens:
+            return text
+
+        tokenizer = self._tokenizer()
+
+        if tokenizer is None:
+            return text[:max_tokens * CHARS_PER_TOKEN]
+
+        ids = tokenizer.encode(text, add_special_tokens=False)[:max_tokens]
+        return tokenizer.decode(ids)
+
+
+token_counter = TokenCounter(PROMPT_TOKENIZER)
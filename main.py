@@ -1,85 +1,269 @@
-from fastapi import FastAPI,UploadFile,File,HTTPException
+from fastapi import FastAPI,UploadFile,File,HTTPException,Request,Depends
 from langchain_core.messages import HumanMessage,AIMessage
-from fastapi.responses import JSONResponse
-from typing import List
-from embeddings.vectorstore import split_store_documents,namespace_deletion
-from generation.response import response_generation
-from embeddings.process_and_load import load_document
-from schema.schema_models import ChatRequest
-from generation.response import chat_history,response_generation
+from fastapi.responses import JSONResponse,StreamingResponse
+from contextlib import asynccontextmanager
+from typing import List,Tuple
+from embeddings.vectorstore import embedding_model,embedding_engine,vector_index,chunker,upsert_writer
+from embeddings.ingestion_executor import ingestion_executor,IngestionQueueFull
+from embeddings.ingestion_jobs import job_manager
+from embeddings.process_and_load import parse_stats
+from schema.schema_models import ChatRequest,ChatSession,IngestionJob
+from generation.response import response_generation,stream_response_generation,retrieval_pool
+from generation.chain_factory import rag_chains
+from generation.answer_cache import answer_cache
+from generation.token_counter import token_counter
+from sessions.session_manager import session_manager,SESSION_HEADER,SESSION_COOKIE
+from sessions.namespace_reaper import namespace_reaper
+from dotenv import load_dotenv
 from pathlib import Path
+import hashlib
+import json
+import asyncio
+import shutil
+import os
 
-app = FastAPI(title="Personal Knowledge Assistant API")
+load_dotenv()
+
+# Skip loading models and clients at startup; each one then loads on first use
+SKIP_WARMUP = os.getenv("SKIP_WARMUP", "false").lower() == "true"
+
+# Lazily created resources, loaded by the warm-up and reported by /health
+COMPONENTS = {
+    "embedding_model": embedding_engine.resource,
+    "chunker": chunker,
+    "prompt_tokenizer": token_counter.tokenizer,
+    "vector_index": vector_index,
+    "llm": rag_chains.model,
+}
+
+
+def warm_up() -> None:
+    """Load every component, carrying on past failures so /health can report each one."""
+
+    for name, resource in COMPONENTS.items():
+        try:
+            resource.get()
+            print(f"Loaded {name} in {resource.load_seconds:.2f}s")
+        except Exception as e:
+            print(f"Error loading {name}: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_manager.start()
+    await namespace_reaper.start()
+
+    # Warm up in the background: the server accepts connections right away and
+    # /health answers 503 until every component is loaded
+    warmup_task = None if SKIP_WARMUP else asyncio.create_task(asyncio.to_thread(warm_up))
+
+    yield
+
+    if warmup_task is not None and not warmup_task.done():
+        await asyncio.wait([warmup_task], timeout=5)
+    await namespace_reaper.stop()
+    await job_manager.stop()
+    ingestion_executor.shutdown()
+    retrieval_pool.shutdown(wait=False)
+    await rag_chains.aclose()
+
+
+app = FastAPI(title="Personal Knowledge Assistant API", lifespan=lifespan)
 
 MODEL_VERSION="1.0.0"
 
 UPLOAD_DIR = Path("./uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+RETRY_AFTER_SECONDS = 10
+
+MAX_SIZE = 1 * 1024 ** 3
+UPLOAD_CHUNK_SIZE = 5 * 1024 ** 2  # 5MB
+
+
+async def release_namespaces(namespaces : List[str]) -> None:
+    """Tombstone sessions' namespaces; the reaper deletes their data in the background."""
+
+    for namespace in namespaces:
+        rag_chains.forget_namespace(namespace)
+
+    await asyncio.to_thread(namespace_reaper.tombstone, namespaces)
+
+
+# Chat messages that end the session instead of being answered
+END_COMMANDS = {"quit", "exit", "end"}
+
+
+async def end_session(session : ChatSession) -> JSONResponse:
+    await asyncio.to_thread(session_manager.end, session)
+    await release_namespaces([session.namespace])
+    return JSONResponse(status_code=200,content={"message":"Conversation ended. Session cleared."})
+
+
+async def get_session(request: Request) -> ChatSession:
+    """Resolve the caller's session from the X-Session-Id header or cookie, creating one if needed."""
+
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    session, evicted = await asyncio.to_thread(session_manager.get_or_create, session_id)
+
+    if evicted:
+        await release_namespaces([old.namespace for old in evicted])
+
+    request.state.session_id = session.session_id
+    return session
+
+
+@app.middleware("http")
+async def attach_session_id(request: Request, call_next):
+    response = await call_next(request)
+
+    session_id = getattr(request.state, "session_id", None)
+    if session_id:
+        response.headers[SESSION_HEADER] = session_id
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+
+    return response
+
+
 @app.get("/")
 def home():
     return JSONResponse(status_code=200, content={"message": "Welcome to the Personal Knowledge Assistant!","version": MODEL_VERSION,})
 
 @app.get("/health")
 def health_check():
-    return {
-        "status": "healthy",
-        "model_status": "loaded",
-        "vector_store_status": "connected",
+    """Readiness of each component; 503 until all are loaded (or, with SKIP_WARMUP, while any failed)."""
+
+    components = {name: resource.status() for name, resource in COMPONENTS.items()}
+
+    if any(component["error"] for component in components.values()):
+        status = "unhealthy"
+    elif SKIP_WARMUP or all(component["ready"] for component in components.values()):
+        status = "healthy"
+    else:
+        status = "starting"
+
+    return JSONResponse(status_code=200 if status == "healthy" else 503, content={
+        "status": status,
+        "warmup": "skipped" if SKIP_WARMUP else "enabled",
+        "components": components,
+        "ingestion_queue": ingestion_executor.stats(),
         "version": MODEL_VERSION
-    }
+    })
     
-@app.post("/load_knowledge")
-async def knowledge_assistant(files: List[UploadFile] = File(..., description="Knowledge that you want to give to assistant")):
+@app.get("/metrics")
+def metrics():
+    return {
+        "answer_cache": answer_cache.stats(),
+        "embedding_cache": embedding_model.stats(),
+        "embedding_engine": embedding_engine.throughput(),
+        "ingestion_queue": ingestion_executor.stats(),
+        "parsing": parse_stats.stats(),
+        "reaper": namespace_reaper.stats(),
+        "sessions": session_manager.stats(),
+        "upserts": upsert_writer.stats(),
+    }
 
-    for file in files:
-        
-        MAX_SIZE= 1 * 1024 ** 3
-        file_size = 0
-        chunk_size = 5 * 1024 ** 2  # 5MB
-        
-        if (UPLOAD_DIR / file.filename).exists():
-            raise HTTPException(status_code=400, detail=f"File {file.filename} already exists!")
-        
-        file_path = UPLOAD_DIR / file.filename
+async def spool_upload(file : UploadFile, file_path : Path) -> Tuple[int, str]:
+    """Stream an uploaded file to disk in one pass.
+
+    The size limit is enforced while copying and the SHA-256 of the content
+    is computed on the same bytes. Disk writes run in a thread so the event
+    loop is never blocked. Returns ``(size, sha256 hex digest)``.
+    """
+
+    file_size = 0
+    digest = hashlib.sha256()
+
+    out_file = await asyncio.to_thread(open, file_path, "wb")
 
-        while chunk := await file.read(chunk_size):
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
             file_size += len(chunk)
-            
+
             if file_size > MAX_SIZE:
-                    raise ValueError("File too large")
-        await file.seek(0)
-        
-        async def process_file(file,file_path,chunk_size=None):
-            with open (file_path,"wb") as out_file:
-                
-                if chunk_size:
-                    while chunk:= await file.read(chunk_size):
-                        out_file.write(chunk)
-                        
-                else:
-                    out_file.write(await file.read())
-                    
-            loaded_docs = await load_document(file_path)
-            await split_store_documents(loaded_docs)
-            
-        try:
-            if file_size < 50 * 1024**2:
-                await process_file(file,file_path)
-                
-            else:
-                await process_file(file,file_path,chunk_size)
-                
-        finally:
-                # Clean up temporary file
-                if file_path and file_path.exists(): 
-                    file_path.unlink()
-    
+                raise HTTPException(status_code=413, detail=f"File {file.filename} is larger than {MAX_SIZE // 1024 ** 2} MB")
+
+            digest.update(chunk)
+            await asyncio.to_thread(out_file.write, chunk)
+
+    finally:
+        await asyncio.to_thread(out_file.close)
+
+    return file_size, digest.hexdigest()
+
+
+async def submit_ingestion_job(files : List[UploadFile], session : ChatSession) -> IngestionJob:
+
+    # Backpressure: refuse the whole batch up front instead of queueing it unboundedly
+    try:
+        ingestion_executor.reserve(len(files))
+    except IngestionQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail={"message": str(e), "status": "queued_full", "ingestion_queue": ingestion_executor.stats()},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+    job_id = job_manager.new_job_id()
+    job_dir = UPLOAD_DIR / job_id
+    job_dir.mkdir()
+    spooled = []
+
+    try:
+        for file in files:
+
+            file_path = job_dir / Path(file.filename).name
+
+            if file_path.exists():
+                raise HTTPException(status_code=400, detail=f"File {file.filename} was uploaded twice!")
+
+            file_size, content_hash = await spool_upload(file, file_path)
+            spooled.append((file.filename, file_path, file_size, content_hash))
+
+    except BaseException:
+        ingestion_executor.release(len(files))
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+    return await job_manager.submit(job_id, job_dir, spooled, session.namespace)
+
+
+@app.post("/jobs")
+async def create_ingestion_job(files: List[UploadFile] = File(..., description="Knowledge that you want to give to assistant"), session: ChatSession = Depends(get_session)):
+    """Queue files for background ingestion and return a job id to poll."""
+
+    job = await submit_ingestion_job(files, session)
+
+    return JSONResponse(status_code=202, content={"job_id": job.job_id, "status": job.status, "status_url": f"/jobs/{job.job_id}"})
+
+
+@app.get("/jobs/{job_id}", response_model=IngestionJob)
+def ingestion_job_status(job_id: str):
+    """Report per-file stage, chunk counts, throughput and errors of a job."""
+
+    job = job_manager.get(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    return job
+
+
+@app.post("/load_knowledge")
+async def knowledge_assistant(files: List[UploadFile] = File(..., description="Knowledge that you want to give to assistant"), session: ChatSession = Depends(get_session)):
+
+    job = await submit_ingestion_job(files, session)
+    job = await job_manager.wait(job.job_id)
+
+    if job.status != "done":
+        errors = {progress.filename: progress.error for progress in job.files if progress.error}
+        raise HTTPException(status_code=500, detail=f"Failed to process some files: {errors}")
+
     return JSONResponse(status_code=200, content={"message": "Files processed and stored successfully."})
-    
+
 
 @app.post('/chat_assistant')
-async def chat_interface(request: ChatRequest):
+async def chat_interface(request: ChatRequest, session: ChatSession = Depends(get_session)):
     """
     Endpoint for chatting with the knowledge assistant.
     Takes a user query and returns a response based on the loaded documents.
@@ -94,20 +278,17 @@ async def chat_interface(request: ChatRequest):
     
     try:
         
-        if query.lower() in {"quit", "exit", "end"}:
-            await namespace_deletion()
-            if chat_history:
-                chat_history.clear()
-            return JSONResponse(status_code=200,content={"message":"Conversation ended. Session cleared."})
+        if query.lower() in END_COMMANDS:
+            return await end_session(session)
         
-        chat_history.append(HumanMessage(content=query))
+        session.chat_history.append(HumanMessage(content=query))
         
         # Generate response using the query
-        response = await response_generation(query,chat_history)
+        response = await response_generation(query,session)
         
-        chat_history.append(AIMessage(content=response))
+        session.chat_history.append(AIMessage(content=response))
         
-        print(chat_history)
+        await asyncio.to_thread(session_manager.save, session)
         
         # Return the response in a structured format
         return JSONResponse(
@@ -130,4 +311,54 @@ async def chat_interface(request: ChatRequest):
                 "message": "Failed to generate response. Please try again."
             }
         )
-    
\ No newline at end of file
+
+
+def sse_event(event : str, data : dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post('/chat_assistant/stream')
+async def chat_stream(request: ChatRequest, session: ChatSession = Depends(get_session)):
+    """
+    Streaming variant of /chat_assistant.
+    Sends Server-Sent Events: `context` when retrieval is done, `token` for each
+    generated piece of text, then `done` with the full response (or `error`).
+    An end command gets the same JSON reply as on /chat_assistant instead of a stream.
+    """
+    query=request.query.strip()
+
+    if not query:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Query cannot be empty"}
+        )
+
+    if query.lower() in END_COMMANDS:
+        return await end_session(session)
+
+    session.chat_history.append(HumanMessage(content=query))
+
+    async def events():
+        tokens = []
+
+        try:
+            async for event, data in stream_response_generation(query,session):
+                if event == "token":
+                    tokens.append(data["text"])
+                yield sse_event(event, data)
+
+            response = "".join(tokens)
+            session.chat_history.append(AIMessage(content=response))
+            await asyncio.to_thread(session_manager.save, session)
+
+            yield sse_event("done", {"query": query, "response": response})
+
+        except Exception as e:
+            print(str(e))
+            yield sse_event("error", {"error": "Internal server error", "message": "Failed to generate response. Please try again."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
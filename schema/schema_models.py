@@ -1,6 +1,6 @@
 from pydantic import BaseModel,Field
 from langchain_core.documents import Document
-from typing import Annotated,List
+from typing import Annotated,List,Literal,Optional
 from langchain_core.messages import BaseMessage
 from pathlib import Path
 
@@ -14,4 +14,33 @@ class FilePath(BaseModel):
     path : Annotated[ Path , Field(...,description="Path of the file that is stored")]
     
 class ChatHist(BaseModel):
-    chat_history : Annotated[ List[BaseMessage] , Field(...,description="Chat history of the user per session")]
\ No newline at end of file
+    chat_history : Annotated[ List[BaseMessage] , Field(...,description="Chat history of the user per session")]
+
+class ChatSession(BaseModel):
+    session_id : Annotated[ str , Field(...,description="Identifier sent by the client in the X-Session-Id header or session_id cookie")]
+    namespace : Annotated[ str , Field(...,description="Vector store namespace holding the session's documents")]
+    chat_history : Annotated[ List[BaseMessage] , Field(default_factory=list,description="Chat history of the session")]
+    history_summary : Annotated[ str , Field("",description="Running summary of the turns no longer sent verbatim")]
+    summarized_upto : Annotated[ int , Field(0,description="Number of chat_history messages folded into history_summary")]
+    created_at : Annotated[ float , Field(...,description="Unix time the session was created")]
+    last_seen : Annotated[ float , Field(...,description="Unix time of the session's last request")]
+
+class FileProgress(BaseModel):
+    filename : Annotated[ str , Field(...,description="Name of the uploaded file")]
+    size_bytes : Annotated[ int , Field(0,description="Size of the uploaded file in bytes")]
+    content_hash : Annotated[ Optional[str] , Field(None,description="SHA-256 of the uploaded bytes")]
+    stage : Annotated[ Literal["queued","parsing","storing","done","skipped","failed"] , Field("queued",description="Current ingestion stage of the file")]
+    chunks : Annotated[ int , Field(0,description="Number of new chunks embedded and stored")]
+    chunks_skipped : Annotated[ int , Field(0,description="Number of chunks already stored in the namespace")]
+    started_at : Annotated[ Optional[float] , Field(None,description="Unix time the file left the queue")]
+    finished_at : Annotated[ Optional[float] , Field(None,description="Unix time the file finished or failed")]
+    elapsed_seconds : Annotated[ float , Field(0.0,description="Processing time so far")]
+    bytes_per_second : Annotated[ float , Field(0.0,description="Input bytes processed per second")]
+    chunks_per_second : Annotated[ float , Field(0.0,description="Chunks stored per second")]
+    error : Annotated[ Optional[str] , Field(None,description="Error message if the file failed")]
+
+class IngestionJob(BaseModel):
+    job_id : Annotated[ str , Field(...,description="Identifier used to poll the job")]
+    status : Annotated[ Literal["queued","running","done","partial","failed"] , Field("queued",description="Overall job status")]
+    created_at : Annotated[ float , Field(...,description="Unix time the job was submitted")]
+    files : Annotated[ List[FileProgress] , Field(default_factory=list,description="Per-file progress")]
@@ -0,0 +1,207 @@
+from embeddings.document_registry import DATA_DIR,document_registry
+from embeddings.vectorstore import namespace_deletion,get_index
+from sessions.session_manager import SessionManager,session_manager
+from typing import Any,Dict,Iterable,List
+from dotenv import load_dotenv
+from pathlib import Path
+import threading
+import asyncio
+import sqlite3
+import time
+import uuid
+import os
+
+load_dotenv()
+
+NAMESPACE_TOMBSTONE_PATH = Path(os.getenv("NAMESPACE_TOMBSTONE_PATH", DATA_DIR / "tombstones.sqlite3"))
+NAMESPACE_REAP_INTERVAL = int(os.getenv("NAMESPACE_REAP_INTERVAL", 30))
+# Tombstoned namespaces deleted per pass, and how many of them at once
+NAMESPACE_REAP_BATCH = int(os.getenv("NAMESPACE_REAP_BATCH", 50))
+NAMESPACE_REAP_CONCURRENCY = int(os.getenv("NAMESPACE_REAP_CONCURRENCY", 4))
+# Seconds between scans of the index for namespaces no live session owns (0 disables)
+NAMESPACE_ORPHAN_SCAN_INTERVAL = int(os.getenv("NAMESPACE_ORPHAN_SCAN_INTERVAL", 3600))
+
+# A claimed tombstone goes back to the queue if it isn't reaped within this many seconds,
+# which is also how long a failed deletion waits before it is retried
+CLAIM_SECONDS = 300
+
+
+def is_session_namespace(namespace : str) -> bool:
+    """Sessions get uuid4 namespaces; anything else in the index is left alone."""
+
+    try:
+        return uuid.UUID(namespace).version == 4
+    except ValueError:
+        return False
+
+
+class NamespaceReaper:
+    """Deletes the namespaces of ended and expired sessions in the background.
+
+    Ending a session only records a tombstone for its namespace, so the
+    request returns at once. Every ``interval`` seconds the reaper expires
+    idle sessions, claims up to ``batch_size`` tombstones and deletes those
+    namespaces, ``concurrency`` at a time. Tombstones live in SQLite, so
+    they survive restarts and uvicorn workers never claim the same one.
+    Once per ``orphan_scan_interval`` the index is listed and namespaces
+    that no live session owns and that haven't changed within the session
+    TTL, e.g. left behind by a restart with in-memory sessions, are
+    tombstoned too.
+    """
+
+    def __init__(self, path : Path, sessions : SessionManager, interval : int = NAMESPACE_REAP_INTERVAL,
+                 batch_size : int = NAMESPACE_REAP_BATCH, concurrency : int = NAMESPACE_REAP_CONCURRENCY,
+                 orphan_scan_interval : int = NAMESPACE_ORPHAN_SCAN_INTERVAL):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.sessions = sessions
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.orphan_scan_interval = orphan_scan_interval
+
+        self._task = None
+        self._last_orphan_scan = 0.0
+        self._reaped = 0
+        self._failed = 0
+        self._orphans = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS tombstones (
+                    namespace TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    claimed_until REAL NOT NULL DEFAULT 0
+                )"""
+            )
+
+    def tombstone(self, namespaces : Iterable[str]) -> None:
+        """Queue ``namespaces`` for deletion."""
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tombstones (namespace, created_at) VALUES (?, ?)",
+                [(namespace, time.time()) for namespace in namespaces]
+            )
+
+    def claim(self, limit : int) -> List[str]:
+        """Take up to ``limit`` tombstones, oldest first, that no worker is reaping."""
+
+        now = time.time()
+
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            namespaces = [row[0] for row in self._conn.execute(
+                "SELECT namespace FROM tombstones WHERE claimed_until < ? ORDER BY created_at LIMIT ?", (now, limit)
+            )]
+            self._conn.executemany(
+                "UPDATE tombstones SET claimed_until = ? WHERE namespace = ?",
+                [(now + CLAIM_SECONDS, namespace) for namespace in namespaces]
+            )
+
+        return namespaces
+
+    def _finish(self, namespace : str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tombstones WHERE namespace = ?", (namespace,))
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0]
+
+    async def _reap(self, namespace : str, slots : asyncio.Semaphore) -> None:
+        async with slots:
+            try:
+                await namespace_deletion(namespace)
+            except Exception as e:
+                # The claim runs out and the next pass after it retries
+                print(f"Error deleting namespace {namespace}: {str(e)}")
+                self._failed += 1
+                return
+
+        await asyncio.to_thread(self._finish, namespace)
+        self._reaped += 1
+
+    def _orphaned(self, namespaces : Iterable[str]) -> List[str]:
+        live = self.sessions.store.namespaces()
+        cutoff_ns = (time.time() - self.sessions.ttl_seconds) * 1e9
+
+        return [
+            namespace for namespace in namespaces
+            if is_session_namespace(namespace) and namespace not in live
+            and document_registry.namespace_version(namespace) < cutoff_ns
+        ]
+
+    async def scan_orphans(self) -> int:
+        """Tombstone index namespaces that belong to no live session; returns how many."""
+
+        self._last_orphan_scan = time.time()
+
+        index = await asyncio.to_thread(get_index)
+        # describe_index_stats lists every namespace in one request, unlike paging through list_namespaces
+        stats = await asyncio.to_thread(index.describe_index_stats)
+        # Read after the index, so a session created in between is still seen as live
+        orphans = await asyncio.to_thread(self._orphaned, stats["namespaces"])
+
+        if orphans:
+            await asyncio.to_thread(self.tombstone, orphans)
+            self._orphans += len(orphans)
+            print(f"Found {len(orphans)} orphaned namespaces")
+
+        return len(orphans)
+
+    async def reap_once(self) -> int:
+        """Expire idle sessions and delete one batch of tombstoned namespaces; returns how many were claimed."""
+
+        expired = await asyncio.to_thread(self.sessions.evict_expired)
+        if expired:
+            await asyncio.to_thread(self.tombstone, [session.namespace for session in expired])
+
+        if self.orphan_scan_interval > 0 and time.time() - self._last_orphan_scan >= self.orphan_scan_interval:
+            try:
+                await self.scan_orphans()
+            except Exception as e:
+                print(f"Error scanning for orphaned namespaces: {str(e)}")
+
+        namespaces = await asyncio.to_thread(self.claim, self.batch_size)
+        slots = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._reap(namespace, slots) for namespace in namespaces))
+
+        return len(namespaces)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.reap_once()
+            except Exception as e:
+                print(f"Error reaping namespaces: {str(e)}")
+                claimed = 0
+
+            # Keep going without a pause while there is a backlog
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending(),
+            "reaped": self._reaped,
+            "failed": self._failed,
+            "orphans_found": self._orphans,
+        }
+
+
+namespace_reaper = NamespaceReaper(NAMESPACE_TOMBSTONE_PATH, session_manager)
@@ -0,0 +1,239 @@
+from langchain_core.messages import messages_from_dict,messages_to_dict
+from embeddings.document_registry import DATA_DIR
+from schema.schema_models import ChatSession
+from collections import OrderedDict
+from typing import Any,Dict,List,Optional,Set,Tuple
+from dotenv import load_dotenv
+from pathlib import Path
+import threading
+import sqlite3
+import time
+import uuid
+import json
+import os
+
+load_dotenv()
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory" or "sqlite"
+SESSION_DB_PATH = Path(os.getenv("SESSION_DB_PATH", DATA_DIR / "sessions.sqlite3"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 24 * 3600))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 1000))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", 60))
+
+SESSION_HEADER = "X-Session-Id"
+SESSION_COOKIE = "session_id"
+
+
+class SessionStore:
+    """Storage backend for chat sessions."""
+
+    def get(self, session_id : str) -> Optional[ChatSession]:
+        raise NotImplementedError
+
+    def put(self, session : ChatSession) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id : str) -> None:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def oldest(self, limit : int) -> List[ChatSession]:
+        """Return up to ``limit`` sessions, least recently seen first."""
+        raise NotImplementedError
+
+    def idle_since(self, cutoff : float) -> List[ChatSession]:
+        """Return the sessions last seen before ``cutoff``."""
+        raise NotImplementedError
+
+    def namespaces(self) -> Set[str]:
+        """Return the namespaces of every live session."""
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions kept in this process only; use with a single worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions : "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def get(self, session_id : str) -> Optional[ChatSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def put(self, session : ChatSession) -> None:
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+
+    def delete(self, session_id : str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def oldest(self, limit : int) -> List[ChatSession]:
+        with self._lock:
+            return list(self._sessions.values())[:limit]
+
+    def idle_since(self, cutoff : float) -> List[ChatSession]:
+        with self._lock:
+            return [session for session in self._sessions.values() if session.last_seen < cutoff]
+
+    def namespaces(self) -> Set[str]:
+        with self._lock:
+            return {session.namespace for session in self._sessions.values()}
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions in a SQLite file, shared by every uvicorn worker on the host."""
+
+    def __init__(self, path : Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    chat_history TEXT NOT NULL,
+                    history_summary TEXT NOT NULL,
+                    summarized_upto INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_seen REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def _to_session(self, row) -> ChatSession:
+        session_id, namespace, chat_history, history_summary, summarized_upto, created_at, last_seen = row
+        return ChatSession(
+            session_id=session_id,
+            namespace=namespace,
+            chat_history=messages_from_dict(json.loads(chat_history)),
+            history_summary=history_summary,
+            summarized_upto=summarized_upto,
+            created_at=created_at,
+            last_seen=last_seen
+        )
+
+    def get(self, session_id : str) -> Optional[ChatSession]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return self._to_session(row) if row else None
+
+    def put(self, session : ChatSession) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session.session_id, session.namespace, json.dumps(messages_to_dict(session.chat_history)),
+                 session.history_summary, session.summarized_upto, session.created_at, session.last_seen)
+            )
+
+    def delete(self, session_id : str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def oldest(self, limit : int) -> List[ChatSession]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM sessions ORDER BY last_seen LIMIT ?", (limit,)).fetchall()
+        return [self._to_session(row) for row in rows]
+
+    def idle_since(self, cutoff : float) -> List[ChatSession]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM sessions WHERE last_seen < ?", (cutoff,)).fetchall()
+        return [self._to_session(row) for row in rows]
+
+    def namespaces(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT namespace FROM sessions")}
+
+
+class SessionManager:
+    """Maps session ids to a private vector namespace and chat history.
+
+    Sessions idle for longer than ``ttl_seconds`` expire, and once
+    ``max_sessions`` are live the least recently seen one is evicted to make
+    room. Expired and evicted sessions are handed back to the caller so their
+    namespaces can be cleaned up.
+    """
+
+    def __init__(self, store : SessionStore, ttl_seconds : int = SESSION_TTL_SECONDS, max_sessions : int = MAX_SESSIONS,
+                 sweep_interval : int = SESSION_SWEEP_INTERVAL):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+
+    def get_or_create(self, session_id : Optional[str]) -> Tuple[ChatSession, List[ChatSession]]:
+        """Return the live session for ``session_id`` (or a new one) and any sessions evicted on the way."""
+
+        now = time.time()
+        evicted = self.evict_expired() if now - self._last_sweep >= self.sweep_interval else []
+
+        session = self.store.get(session_id) if session_id else None
+
+        if session is not None and now - session.last_seen > self.ttl_seconds:
+            self.store.delete(session.session_id)
+            evicted.append(session)
+            session = None
+
+        if session is None:
+            overflow = self.store.count() - self.max_sessions + 1
+            if overflow > 0:
+                for old in self.store.oldest(overflow):
+                    self.store.delete(old.session_id)
+                    evicted.append(old)
+
+            session = ChatSession(
+                session_id=uuid.uuid4().hex,
+                namespace=str(uuid.uuid4()),
+                created_at=now,
+                last_seen=now
+            )
+
+        self.save(session)
+
+        return session, evicted
+
+    def save(self, session : ChatSession) -> None:
+        session.last_seen = time.time()
+        self.store.put(session)
+
+    def end(self, session : ChatSession) -> None:
+        self.store.delete(session.session_id)
+
+    def evict_expired(self) -> List[ChatSession]:
+        self._last_sweep = time.time()
+        expired = self.store.idle_since(self._last_sweep - self.ttl_seconds)
+
+        for session in expired:
+            self.store.delete(session.session_id)
+
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": SESSION_BACKEND, "live_sessions": self.store.count(), "max_sessions": self.max_sessions}
+
+
+def create_session_store(backend : str = SESSION_BACKEND) -> SessionStore:
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore(SESSION_DB_PATH)
+    raise ValueError(f"Unknown session backend {backend!r}, expected 'memory' or 'sqlite'")
+
+
+session_manager = SessionManager(create_session_store())